@@ -1,7 +1,9 @@
-from flask import request
+import hashlib
+import json
+from flask import request, current_app
 from app.core.config import Config
 from app.core.monitoring import MonitoringService
-from flask_restx import Resource, fields
+from flask_restx import Resource, fields, marshal
 from app.api import monitoring_ns, api
 
 # Initialize configuration
@@ -35,6 +37,19 @@ drift_result_model = monitoring_ns.model('DriftResult', {
   'results': fields.List(fields.Raw, description='Notification results')
 })
 
+def conditional_response(data, model):
+  """
+  Marshal data into a JSON response tagged with a strong ETag.
+  Pollers sending a matching If-None-Match get an empty 304 instead.
+  """
+  body = json.dumps(marshal(data, model), sort_keys=True)
+  etag = hashlib.blake2b(body.encode('utf-8'), digest_size=16).hexdigest()
+  
+  response = current_app.response_class(body, mimetype='application/json')
+  response.set_etag(etag)
+  response.headers['Cache-Control'] = 'private, max-age=5'
+  return response.make_conditional(request)
+
 @monitoring_ns.route('/run')
 class RunMonitoring(Resource):
   @monitoring_ns.doc('run_monitoring')
@@ -58,15 +73,7 @@ class RunAllMonitoring(Resource):
     metrics = monitoring_service.collect_all_queue_metrics()
     
     # Prepare data for Zabbix
-    zabbix_data_points = []
-    for metric in metrics:
-      host = metric.get('host')
-      for key, value in metric.get('metrics', {}).items():
-        zabbix_data_points.append({
-          'host': host,
-          'key': key,
-          'value': value
-        })
+    zabbix_data_points = monitoring_service.build_data_points(metrics)
     
     # Send data to Zabbix
     result = monitoring_service.zabbix_client.send_values_to_zabbix(zabbix_data_points)
@@ -96,20 +103,22 @@ class MonitoredQueues(Resource):
 @monitoring_ns.route('/metrics')
 class Metrics(Resource):
   @monitoring_ns.doc('get_metrics')
-  @monitoring_ns.marshal_list_with(metrics_model)
+  @monitoring_ns.response(200, 'Success', [metrics_model])
+  @monitoring_ns.response(304, 'Not modified')
   def get(self):
     """Collect metrics without sending to Zabbix"""
     metrics = monitoring_service.collect_queue_metrics()
-    return metrics
+    return conditional_response(metrics, metrics_model)
 
 @monitoring_ns.route('/metrics-all')
 class AllMetrics(Resource):
   @monitoring_ns.doc('get_all_metrics')
-  @monitoring_ns.marshal_list_with(metrics_model)
+  @monitoring_ns.response(200, 'Success', [metrics_model])
+  @monitoring_ns.response(304, 'Not modified')
   def get(self):
     """Collect metrics for ALL queues without sending to Zabbix"""
     metrics = monitoring_service.collect_all_queue_metrics()
-    return metrics
+    return conditional_response(metrics, metrics_model)
 
 @monitoring_ns.route('/check-drift')
 class CheckDrift(Resource):
@@ -144,15 +153,7 @@ class CompleteMonitoring(Resource):
     metrics = monitoring_service.collect_all_queue_metrics()
     
     # Prepare data for Zabbix
-    zabbix_data_points = []
-    for metric in metrics:
-      host = metric.get('host')
-      for key, value in metric.get('metrics', {}).items():
-        zabbix_data_points.append({
-          'host': host,
-          'key': key,
-          'value': value
-        })
+    zabbix_data_points = monitoring_service.build_data_points(metrics)
     
     # Send data to Zabbix
     zabbix_result = monitoring_service.zabbix_client.send_values_to_zabbix(zabbix_data_points)
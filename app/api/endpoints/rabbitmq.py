@@ -1,7 +1,7 @@
 from flask import request
 from app.core.config import Config
 from app.core.rabbitmq import RabbitMQClient
-from flask_restx import Resource
+from flask_restx import Resource, fields
 from app.api import rabbitmq_ns, queue_model, cluster_model
 import urllib.parse
 
@@ -9,6 +9,12 @@ import urllib.parse
 config = Config()
 rabbitmq_client = RabbitMQClient(config.get_config())
 
+node_health_model = rabbitmq_ns.model('NodeHealth', {
+  'cluster_id': fields.String(description='Cluster ID'),
+  'hostname': fields.String(description='Node hostname'),
+  'healthy': fields.Boolean(description='Whether the node passed every health check')
+})
+
 @rabbitmq_ns.route('/clusters')
 class ClusterList(Resource):
   @rabbitmq_ns.doc('list_clusters')
@@ -16,12 +22,11 @@ class ClusterList(Resource):
   def get(self):
     """Get all RabbitMQ clusters"""
     clusters = config.get('rabbitmq', {}).get('clusters', [])
-    # Remove sensitive information
-    for cluster in clusters:
-      if 'auth' in cluster:
-        del cluster['auth']
-    
-    return clusters
+    # Remove sensitive information, on copies since the config is shared
+    return [
+      {key: value for key, value in cluster.items() if key != 'auth'}
+      for cluster in clusters
+    ]
 
 @rabbitmq_ns.route('/clusters/<cluster_id>')
 @rabbitmq_ns.param('cluster_id', 'The cluster identifier')
@@ -35,11 +40,8 @@ class Cluster(Resource):
     if not cluster:
       rabbitmq_ns.abort(404, "Cluster not found")
     
-    # Remove sensitive information
-    if 'auth' in cluster:
-      del cluster['auth']
-    
-    return cluster
+    # Remove sensitive information, on a copy since the config is shared
+    return {key: value for key, value in cluster.items() if key != 'auth'}
 
 @rabbitmq_ns.route('/clusters/<cluster_id>/queues')
 @rabbitmq_ns.param('cluster_id', 'The cluster identifier')
@@ -50,8 +52,8 @@ class QueueList(Resource):
     """Get all queues for a specific cluster"""
     queues = rabbitmq_client.get_all_queues(cluster_id)
     
-    if isinstance(queues, dict) and "error" in queues:
-      rabbitmq_ns.abort(400, queues["error"])
+    if not queues and cluster_id in rabbitmq_client.last_errors:
+      rabbitmq_ns.abort(400, rabbitmq_client.last_errors[cluster_id])
     
     return queues
 
@@ -71,4 +73,16 @@ class Queue(Resource):
     if isinstance(queue_info, dict) and "error" in queue_info:
       rabbitmq_ns.abort(400, queue_info["error"])
     
-    return queue_info
\ No newline at end of file
+    return queue_info
+
+@rabbitmq_ns.route('/health')
+class NodeHealth(Resource):
+  @rabbitmq_ns.doc('check_nodes_health')
+  @rabbitmq_ns.marshal_list_with(node_health_model)
+  def get(self):
+    """Check the health of every node of every RabbitMQ cluster"""
+    return [
+      {'cluster_id': cluster_id, 'hostname': hostname, 'healthy': healthy}
+      for cluster_id, nodes in rabbitmq_client.check_all_nodes_health().items()
+      for hostname, healthy in nodes.items()
+    ]
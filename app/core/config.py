@@ -1,6 +1,11 @@
 import os
 import json
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Tuple
+
+# Parsed configuration files shared by every Config instance: path -> (mtime, config)
+_config_cache: Dict[str, Tuple[float, Dict]] = {}
+_config_cache_lock = threading.Lock()
 
 class Config:
   def __init__(self, config_path: str = "config/config.json"):
@@ -8,10 +13,18 @@ class Config:
     self._config = self._load_config()
   
   def _load_config(self) -> Dict:
-    """Load configuration from file"""
+    """Load configuration from file, reusing the parsed copy while the file is unchanged"""
+    path = os.path.abspath(self.config_path)
     try:
-      with open(self.config_path, 'r') as f:
-        return json.load(f)
+      mtime = os.stat(path).st_mtime
+      with _config_cache_lock:
+        cached = _config_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+          return cached[1]
+        with open(path, 'r') as f:
+          config = json.load(f)
+        _config_cache[path] = (mtime, config)
+        return config
     except Exception as e:
       print(f"Error loading configuration: {str(e)}")
       return {}
@@ -22,4 +35,4 @@ class Config:
   
   def get(self, section: str, default: Any = None) -> Any:
     """Get a specific section of the configuration"""
-    return self._config.get(section, default)
\ No newline at end of file
+    return self._config.get(section, default)
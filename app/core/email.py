@@ -1,16 +1,80 @@
 # app/core/email.py
 import logging
-import smtplib
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
-from typing import List, Dict, Optional
+from email.message import EmailMessage
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
+from jinja2 import DictLoader, Environment
 from app.utils.config import config
+from app.core.smtp import SMTPPool
 
 logger = logging.getLogger(__name__)
 
+# Built-in drift alert body (Jinja2), used when no template file is configured
+_DEFAULT_DRIFT_TEMPLATE = """
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        .header { background-color: #f0f0f0; padding: 10px; border-bottom: 1px solid #ddd; }
+        .content { padding: 20px; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { text-align: left; padding: 8px; border: 1px solid #ddd; }
+        th { background-color: #f2f2f2; }
+        .alert { color: #721c24; background-color: #f8d7da; padding: 10px; border-radius: 4px; }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h2>RabbitMQ Queue Size Drift Alert</h2>
+    </div>
+    <div class="content">
+        <p>A significant increase in queue size has been detected:</p>
+
+        <div class="alert">
+            <p><strong>Alert:</strong> Queue size increased by {{ "%.1f"|format(increase_percentage) }}%</p>
+        </div>
+
+        <h3>Queue Details</h3>
+        <table>
+            <tr><th>Cluster</th><td>{{ cluster_id }}</td></tr>
+            <tr><th>Virtual Host</th><td>{{ vhost }}</td></tr>
+            <tr><th>Queue Name</th><td>{{ queue }}</td></tr>
+            <tr><th>Host</th><td>{{ host }}</td></tr>
+            <tr><th>Previous Value</th><td>{{ previous_value }}</td></tr>
+            <tr><th>Current Value</th><td>{{ current_value }}</td></tr>
+            <tr><th>Increase</th><td>{{ increase }} ({{ "%.1f"|format(increase_percentage) }}%)</td></tr>
+            <tr><th>Timestamp</th><td>{{ timestamp }}</td></tr>
+        </table>
+
+        <p>Please investigate this increase to ensure it's not causing issues with your system.</p>
+    </div>
+</body>
+</html>
+"""
+
+# A template checked once: (text, needs_format)
+ParsedTemplate = Tuple[str, bool]
+
+def _parse_template(text: str) -> ParsedTemplate:
+    """
+    Check once whether a str.format template has to be formatted.
+    
+    Only text without any braces is used verbatim. Anything else is formatted,
+    so a template whose braces are not valid format fields (e.g. raw CSS rules)
+    fails to render and the caller falls back to its generated content.
+    """
+    return text, '{' in text or '}' in text
+
+# Compiled once at import; templates never change at runtime so auto_reload is off
+_jinja_env = Environment(
+    loader=DictLoader({'drift_default': _DEFAULT_DRIFT_TEMPLATE}),
+    autoescape=True,
+    auto_reload=False,
+    cache_size=400
+)
+_DEFAULT_DRIFT = _jinja_env.get_template('drift_default')
+
 class EmailSender:
     def __init__(self):
         """Initialize email sender with config"""
@@ -22,9 +86,31 @@ class EmailSender:
         self.from_address = self.config.get('from_address', 'rabbitmq-monitor@example.com')
         self.templates = self.config.get('templates', {})
         self.alert_configs = self.config.get('alerts', {})
+        # Parsed templates keyed by template name with the file mtime they were read at,
+        # re-read only when the file changes
+        self._template_cache: Dict[str, Tuple[float, ParsedTemplate]] = {}
+        
+        # Drift alert settings do not change at runtime, resolve them once
+        self._drift_config: Optional[Dict] = self.alert_configs.get('drift')
+        drift_config = self._drift_config or {}
+        self._drift_to: List[str] = list(drift_config.get('to', []))
+        self._drift_cc: List[str] = list(drift_config.get('cc', []))
+        self._drift_template_name: Optional[str] = drift_config.get('template')
+        self._drift_subject = _parse_template(drift_config.get('subject', 'Queue Size Drift Alert'))
+        if self._drift_config is None:
+            logger.warning("Drift alert configuration not found")
+        elif not self._drift_to:
+            logger.warning("No recipients specified for drift alert")
+        # SMTP sessions reused across alerts
+        self._smtp = SMTPPool(
+            self.smtp_server, self.smtp_port, self.smtp_user, self.smtp_password,
+            starttls=True,
+            size=int(self.config.get('pool_size', 4)),
+            max_messages=int(self.config.get('max_messages_per_connection', 100))
+        )
         
     def send_drift_alert(self, queue_info: Dict, current_value: int, previous_value: int, 
-                        increase_percentage: float) -> bool:
+                        increase_percentage: float, timestamp: Optional[str] = None) -> bool:
         """
         Send email alert for queue size drift
         
@@ -33,156 +119,124 @@ class EmailSender:
             current_value: Current message_ready count
             previous_value: Previous message_ready count
             increase_percentage: Percentage increase
+            timestamp: Formatted detection time, shared by all alerts of a cycle;
+                the current time is used when omitted
             
         Returns:
             bool: True if email was sent successfully, False otherwise
         """
         try:
-            if 'drift' not in self.alert_configs:
+            if self._drift_config is None:
                 logger.error("Drift alert configuration not found")
                 return False
-                
-            alert_config = self.alert_configs['drift']
-            vhost = queue_info.get('vhost', 'unknown')
-            queue = queue_info.get('queue', 'unknown')
-            host = queue_info.get('zabbix_host', 'unknown')
-            cluster_id = queue_info.get('cluster_id', 'unknown')
-            
-            # Get recipients
-            to_list = alert_config.get('to', [])
-            cc_list = alert_config.get('cc', [])
             
-            if not to_list:
+            if not self._drift_to:
                 logger.error("No recipients specified for drift alert")
                 return False
             
             # Get subject with placeholders replaced
-            subject = alert_config.get('subject', 'Queue Size Drift Alert')
-            subject = subject.format(
-                vhost=vhost,
-                queue=queue,
-                host=host,
-                cluster=cluster_id,
-                percentage=round(increase_percentage, 1)
-            )
+            subject, needs_format = self._drift_subject
+            if needs_format:
+                subject = subject.format_map({
+                    'vhost': queue_info.get('vhost', 'unknown'),
+                    'queue': queue_info.get('queue', 'unknown'),
+                    'host': queue_info.get('zabbix_host', 'unknown'),
+                    'cluster': queue_info.get('cluster_id', 'unknown'),
+                    'percentage': round(increase_percentage, 1)
+                })
             
             # Build email content
             html_content = self._build_drift_alert_content(
-                queue_info, current_value, previous_value, increase_percentage
+                queue_info, current_value, previous_value, increase_percentage, timestamp
             )
             
             # Send email
-            return self._send_email(to_list, cc_list, subject, html_content)
+            return self._send_email(self._drift_to, self._drift_cc, subject, html_content)
             
         except Exception as e:
-            logger.error(f"Error sending drift alert: {str(e)}")
+            logger.error("Error sending drift alert: %s", e)
             return False
     
     def _build_drift_alert_content(self, queue_info: Dict, current_value: int, 
-                                  previous_value: int, increase_percentage: float) -> str:
+                                  previous_value: int, increase_percentage: float,
+                                  timestamp: Optional[str] = None) -> str:
         """Build HTML content for drift alert email"""
         try:
             # Try to load template if configured
-            template_name = self.alert_configs.get('drift', {}).get('template')
-            html_content = self._load_template(template_name)
-            
-            # If template loading failed, use default template
-            if not html_content:
-                html_content = """
-                <html>
-                <head>
-                    <style>
-                        body { font-family: Arial, sans-serif; margin: 20px; }
-                        .header { background-color: #f0f0f0; padding: 10px; border-bottom: 1px solid #ddd; }
-                        .content { padding: 20px; }
-                        table { border-collapse: collapse; width: 100%; }
-                        th, td { text-align: left; padding: 8px; border: 1px solid #ddd; }
-                        th { background-color: #f2f2f2; }
-                        .alert { color: #721c24; background-color: #f8d7da; padding: 10px; border-radius: 4px; }
-                    </style>
-                </head>
-                <body>
-                    <div class="header">
-                        <h2>RabbitMQ Queue Size Drift Alert</h2>
-                    </div>
-                    <div class="content">
-                        <p>A significant increase in queue size has been detected:</p>
-                        
-                        <div class="alert">
-                            <p><strong>Alert:</strong> Queue size increased by {increase_percentage:.1f}%</p>
-                        </div>
-                        
-                        <h3>Queue Details</h3>
-                        <table>
-                            <tr><th>Cluster</th><td>{cluster_id}</td></tr>
-                            <tr><th>Virtual Host</th><td>{vhost}</td></tr>
-                            <tr><th>Queue Name</th><td>{queue}</td></tr>
-                            <tr><th>Host</th><td>{host}</td></tr>
-                            <tr><th>Previous Value</th><td>{previous_value}</td></tr>
-                            <tr><th>Current Value</th><td>{current_value}</td></tr>
-                            <tr><th>Increase</th><td>{increase} ({increase_percentage:.1f}%)</td></tr>
-                            <tr><th>Timestamp</th><td>{timestamp}</td></tr>
-                        </table>
-                        
-                        <p>Please investigate this increase to ensure it's not causing issues with your system.</p>
-                    </div>
-                </body>
-                </html>
-                """
+            template = self._load_template(self._drift_template_name)
+            
+            # File templates use str.format fields, skip formatting when they have none
+            if template and template[0]:
+                html_content, needs_format = template
+                if not needs_format:
+                    return html_content
+            else:
+                html_content = None
             
             # Fill in template variables
-            vhost = queue_info.get('vhost', 'unknown')
-            queue = queue_info.get('queue', 'unknown')
-            host = queue_info.get('zabbix_host', 'unknown')
-            cluster_id = queue_info.get('cluster_id', 'unknown')
-            increase = current_value - previous_value
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            html_content = html_content.format(
-                vhost=vhost,
-                queue=queue,
-                host=host,
-                cluster_id=cluster_id,
-                previous_value=previous_value,
-                current_value=current_value,
-                increase=increase,
-                increase_percentage=increase_percentage,
-                timestamp=timestamp
-            )
+            if timestamp is None:
+                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            
+            ctx = {
+                'vhost': queue_info.get('vhost', 'unknown'),
+                'queue': queue_info.get('queue', 'unknown'),
+                'host': queue_info.get('zabbix_host', 'unknown'),
+                'cluster_id': queue_info.get('cluster_id', 'unknown'),
+                'previous_value': previous_value,
+                'current_value': current_value,
+                'increase': current_value - previous_value,
+                'increase_percentage': increase_percentage,
+                'timestamp': timestamp
+            }
+            
+            # No usable template file, render the built-in Jinja2 template
+            if html_content is None:
+                return _DEFAULT_DRIFT.render(ctx)
             
-            return html_content
+            return html_content.format_map(ctx)
             
         except Exception as e:
-            logger.error(f"Error building drift alert content: {str(e)}")
+            logger.error("Error building drift alert content: %s", e)
             # Return simple fallback content
-            return f"""
-            <html><body>
-            <h2>RabbitMQ Queue Size Drift Alert</h2>
-            <p>Queue {queue_info.get('vhost', '')}/{queue_info.get('queue', '')} has increased from {previous_value} to {current_value} messages ({increase_percentage:.1f}%).</p>
-            </body></html>
-            """
+            return "".join((
+                "<html><body>\n<h2>RabbitMQ Queue Size Drift Alert</h2>\n<p>Queue ",
+                str(queue_info.get('vhost', '')), "/", str(queue_info.get('queue', '')),
+                " has increased from ", str(previous_value), " to ", str(current_value),
+                " messages (", format(increase_percentage, '.1f'), "%).</p>\n</body></html>\n"
+            ))
     
-    def _load_template(self, template_name: Optional[str]) -> Optional[str]:
-        """Load HTML template from file"""
+    def _load_template(self, template_name: Optional[str]) -> Optional[ParsedTemplate]:
+        """Load and pre-parse HTML template from file, reloading it when the file changes"""
         if not template_name or template_name not in self.templates:
             return None
-            
+        
         template_path = self.templates.get(template_name)
-        if not template_path or not os.path.exists(template_path):
-            logger.warning(f"Template file not found: {template_path}")
+        if not template_path:
+            logger.warning("Template file not found: %s", template_path)
             return None
             
         try:
+            mtime = os.stat(template_path).st_mtime
+            cached = self._template_cache.get(template_name)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            
             with open(template_path, 'r') as f:
-                return f.read()
+                template = _parse_template(f.read())
+            self._template_cache[template_name] = (mtime, template)
+            return template
+        except FileNotFoundError:
+            self._template_cache.pop(template_name, None)
+            logger.warning("Template file not found: %s", template_path)
+            return None
         except Exception as e:
-            logger.error(f"Error loading template {template_path}: {str(e)}")
+            logger.error("Error loading template %s: %s", template_path, e)
             return None
     
     def _send_email(self, to_list: List[str], cc_list: List[str], subject: str, html_content: str) -> bool:
         """Send email using SMTP"""
         try:
-            msg = MIMEMultipart('alternative')
+            msg = EmailMessage()
             ### TODO: Add cluster (prod/test) to subject
             msg['Subject'] = subject
             msg['From'] = self.from_address
@@ -194,21 +248,15 @@ class EmailSender:
             else:
                 recipients = to_list
             
-            # Attach HTML content
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
+            # HTML body as the only part
+            msg.set_content(html_content, subtype='html')
             
-            # Connect to SMTP server and send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                if self.smtp_user and self.smtp_password:
-                    server.starttls()
-                    server.login(self.smtp_user, self.smtp_password)
-                
-                server.sendmail(self.from_address, recipients, msg.as_string())
+            # Send over the shared SMTP session
+            self._smtp.send_message(msg, self.from_address, recipients)
                 
-            logger.info(f"Sent email alert to {', '.join(recipients)}: {subject}")
+            logger.info("Sent email alert to %s: %s", ', '.join(recipients), subject)
             return True
             
         except Exception as e:
-            logger.error(f"Error sending email: {str(e)}")
+            logger.error("Error sending email: %s", e)
             return False
\ No newline at end of file
@@ -1,8 +1,169 @@
-from typing import Dict, List, Any, Optional
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from operator import itemgetter
+from typing import Callable, Dict, List, Any, Optional, Tuple, TypedDict
 from app.core.rabbitmq import RabbitMQClient
 from app.core.zabbix import ZabbixClient
 from app.core.notification import NotificationClient
 
+# Upper bound on concurrent RabbitMQ management API requests
+FETCH_WORKERS = 16
+
+# Data points per zabbix_sender batch, points allowed to wait for the sender,
+# and how long a partial batch may wait for more points before it is sent
+ZABBIX_BATCH_SIZE = 250
+ZABBIX_QUEUE_SIZE = 500
+ZABBIX_FLUSH_INTERVAL = 0.2
+
+# Seconds a producer waits on a full queue before checking the sender thread is still running
+ZABBIX_PUT_TIMEOUT = 0.5
+
+class QueueInfo(TypedDict):
+  """Queue details carried with each collected metric"""
+  vhost: str
+  queue: str
+  messages: int
+  consumers: int
+  state: str
+
+class QueueMetric(TypedDict):
+  """Metrics of one queue, keyed by Zabbix item key, for one Zabbix host"""
+  host: str
+  metrics: Dict[str, int]
+  queue_info: QueueInfo
+
+class DataPoint(TypedDict):
+  """A single value for zabbix_sender"""
+  host: str
+  key: str
+  value: Any
+
+# Required fields of a monitored queue entry, unpacked in one call in hot loops
+_queue_fields = itemgetter('cluster_node', 'vhost', 'queue', 'zabbix_host')
+_drift_fields = itemgetter('vhost', 'queue', 'zabbix_host')
+
+# Queue metrics from the management API, present on nearly every queue
+_metric_fields = itemgetter('messages', 'consumers', 'state')
+
+def _queue_metrics(queue_info: Dict) -> Tuple[int, int, str]:
+  """Return (messages, consumers, state) of a queue, with defaults for missing keys"""
+  try:
+    return _metric_fields(queue_info)
+  except KeyError:
+    # Queues that are still starting up may not report all stats yet
+    return (
+      queue_info.get('messages', 0),
+      queue_info.get('consumers', 0),
+      queue_info.get('state', 'unknown')
+    )
+
+class ZabbixStream:
+  """
+  Sends data points to Zabbix from a background thread while they are still
+  being collected, so RabbitMQ reads overlap with Zabbix writes.
+  
+  When values have to go through zabbix_sender, each batch would cost a
+  process of its own, so the points are collected instead and sent with a
+  single call from close().
+  """
+  def __init__(self, zabbix_client: ZabbixClient):
+    self.zabbix_client = zabbix_client
+    # Data points the Zabbix server reported as processed
+    self.sent = 0
+    self._results: List[Dict] = []
+    self._pending: List[DataPoint] = []
+    self._dropped = 0
+    self._streaming = zabbix_client.uses_socket()
+    self._queue: queue.Queue = queue.Queue(maxsize=ZABBIX_QUEUE_SIZE)
+    self._thread: Optional[threading.Thread] = None
+    if self._streaming:
+      self._thread = threading.Thread(target=self._run, daemon=True)
+      self._thread.start()
+  
+  def _put(self, item: Optional[DataPoint]) -> bool:
+    """Queue an item for the sender thread, False once that thread has exited"""
+    thread = self._thread
+    while thread is not None and thread.is_alive():
+      try:
+        self._queue.put(item, timeout=ZABBIX_PUT_TIMEOUT)
+        return True
+      except queue.Full:
+        continue
+    return False
+  
+  def put_metric(self, metric: QueueMetric) -> None:
+    """Queue the data points of one collected metric, blocking while the queue is full"""
+    points = MonitoringService.build_data_points([metric])
+    if not self._streaming:
+      self._pending.extend(points)
+      return
+    
+    for point in points:
+      if not self._put(point):
+        self._dropped += 1
+  
+  def _send(self, batch: List[DataPoint]) -> None:
+    """Send one batch, recording its result and how many points were processed"""
+    try:
+      result = self.zabbix_client.send_values_to_zabbix(batch)
+    except Exception as e:
+      result = {"success": False, "error": f"Failed to send to Zabbix: {str(e)}", "failed": len(batch)}
+    
+    self._results.append(result)
+    self.sent += result.get("processed", len(batch) if result.get("success") else 0)
+  
+  def _run(self) -> None:
+    """Drain the queue into batches until the end-of-stream sentinel arrives"""
+    done = False
+    while not done:
+      batch = []
+      item = self._queue.get()
+      deadline = time.monotonic() + ZABBIX_FLUSH_INTERVAL
+      
+      while True:
+        if item is None:
+          done = True
+          break
+        batch.append(item)
+        if len(batch) >= ZABBIX_BATCH_SIZE:
+          break
+        try:
+          item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+          break
+      
+      if batch:
+        self._send(batch)
+  
+  def close(self) -> Dict:
+    """Flush the remaining points and return the combined sender result"""
+    if self._thread is not None:
+      self._put(None)
+      self._thread.join()
+    elif self._pending:
+      self._send(self._pending)
+      self._pending = []
+    
+    if self._dropped:
+      self._results.append({
+        "success": False,
+        "error": f"Zabbix sender thread stopped, {self._dropped} data points not sent",
+        "failed": self._dropped
+      })
+    
+    if not self._results:
+      return {"success": True, "message": "No data points to send"}
+    if len(self._results) == 1:
+      return self._results[0]
+    
+    return {
+      "success": all(r.get("success", False) for r in self._results),
+      "batches": self._results
+    }
+
 class MonitoringService:
   def __init__(self, config: Dict):
     self.config = config
@@ -14,38 +175,52 @@ class MonitoringService:
     self.rabbitmq_client = RabbitMQClient(config)
     self.zabbix_client = ZabbixClient(config)
     self.notification_client = NotificationClient(config)
-  
-  def get_node_from_queue_config(self, queue_config: Dict) -> Optional[Dict]:
-    """Get node information for a queue configuration"""
-    cluster_node = queue_config.get('cluster_node')
     
-    # Find the cluster this node belongs to
+    # Node hostname -> {'cluster_id', 'node'}, first cluster listing a hostname wins
+    self._hostname_index: Dict[Optional[str], Dict] = {}
     for cluster in self.config.get('rabbitmq', {}).get('clusters', []):
       for node in cluster.get('nodes', []):
-        if node.get('hostname') == cluster_node:
-          return {
-            'cluster_id': cluster.get('id'),
-            'node': node
-          }
+        self._hostname_index.setdefault(node.get('hostname'), {
+          'cluster_id': cluster.get('id'),
+          'node': node
+        })
     
-    return None
-  
-  def collect_queue_metrics(self) -> List[Dict]:
-    """
-    Collect metrics for all configured queues
+    # Cluster ID -> default Zabbix host, for clusters with monitoring enabled
+    self._default_zabbix_hosts: Dict[str, Optional[str]] = {}
+    for cluster in self.config.get('rabbitmq', {}).get('clusters', []):
+      monitoring = cluster.get('monitoring', {})
+      if monitoring.get('enabled', False):
+        self._default_zabbix_hosts[cluster.get('id')] = monitoring.get('default_zabbix_host')
     
-    Returns:
-        List of queue metric data points
-    """
-    results = []
+    self._build_zabbix_host_index()
+    self._build_monitored_index()
+  
+  def _build_zabbix_host_index(self) -> None:
+    """Map (vhost, queue) of monitored queues to their configured Zabbix host"""
+    self._queue_host_map: Dict[Tuple[str, str], str] = {}
+    seen = set()
     
+    for q_config in self.queues:
+      key = (q_config.get('vhost'), q_config.get('queue'))
+      # Only the first entry for a queue counts, like the lookup it replaces
+      if key in seen:
+        continue
+      seen.add(key)
+      
+      if 'zabbix_host' in q_config:
+        self._queue_host_map[key] = q_config['zabbix_host']
+  
+  def _build_monitored_index(self) -> None:
+    """Resolve the fixed per-queue lookups and item keys of monitored queues once"""
+    # (cluster_id, vhost, queue, zabbix_host) of queues whose metrics are collected
+    self._monitored: List[Tuple[str, str, str, str]] = []
     for queue_config in self.queues:
-      cluster_node = queue_config.get('cluster_node')
-      vhost = queue_config.get('vhost')
-      queue_name = queue_config.get('queue')
-      zabbix_host = queue_config.get('zabbix_host')
+      try:
+        cluster_node, vhost, queue_name, zabbix_host = _queue_fields(queue_config)
+      except KeyError:
+        continue
       
-      if not all([cluster_node, vhost, queue_name, zabbix_host]):
+      if not (cluster_node and vhost and queue_name and zabbix_host):
         continue
       
       # Get node info to find cluster ID
@@ -53,23 +228,86 @@ class MonitoringService:
       if not node_info:
         continue
       
-      # Get queue info from RabbitMQ
-      queue_info = self.rabbitmq_client.get_queue_info(
-        node_info['cluster_id'], 
-        vhost, 
-        queue_name
-      )
+      self._monitored.append((node_info['cluster_id'], vhost, queue_name, zabbix_host))
+    
+    # (vhost, queue, zabbix_host, cluster_node, item_key) of queues checked for drift
+    self._drift_items: List[Tuple[str, str, str, Optional[str], str]] = []
+    for queue_config in self.monitoring_config.get('queues', []):
+      try:
+        vhost, queue_name, zabbix_host = _drift_fields(queue_config)
+      except KeyError:
+        continue
+      
+      if not (vhost and queue_name and zabbix_host):
+        continue
       
-      if "error" in queue_info:
+      item_key = f"rabbitmq.test.queue.size[{vhost},{queue_name}]"
+      self._drift_items.append((vhost, queue_name, zabbix_host, queue_config.get('cluster_node'), item_key))
+  
+  def get_node_from_queue_config(self, queue_config: Dict) -> Optional[Dict]:
+    """Get node information for a queue configuration"""
+    return self._hostname_index.get(queue_config.get('cluster_node'))
+  
+  def _dispatch_alerts(self, alerts: List[Dict]) -> List[Dict]:
+    """
+    Send alert notifications in parallel over the notification SMTP pool
+    
+    Returns:
+        List of send results, in the same order as alerts
+    """
+    if len(alerts) <= 1:
+      return [self.notification_client.send_alert(a['type'], a.get('queue_info', {})) for a in alerts]
+    
+    workers = min(len(alerts), self.notification_client.pool_size)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      return list(executor.map(
+        lambda a: self.notification_client.send_alert(a['type'], a.get('queue_info', {})),
+        alerts
+      ))
+  
+  def _threshold_alerts(self, metrics: List[QueueMetric]) -> List[Dict]:
+    """Build threshold alerts for collected metrics above the message threshold"""
+    threshold = self.threshold
+    return [
+      {'type': 'threshold', 'queue_info': m['queue_info']}
+      for m in metrics if m['queue_info']['messages'] > threshold
+    ]
+  
+  def _get_cluster_queues(self, cluster_id: str) -> Dict[Tuple[str, str], Dict]:
+    """Get all queues of a cluster indexed by (vhost, queue name)"""
+    return self.rabbitmq_client.get_queue_index(cluster_id)
+  
+  def collect_queue_metrics(self) -> List[QueueMetric]:
+    """
+    Collect metrics for all configured queues
+    
+    Returns:
+        List of queue metric data points
+    """
+    results: List[QueueMetric] = []
+    
+    # Cluster of every monitored queue, resolved once from the config
+    monitored = self._monitored
+    
+    # Fetch the queues of each cluster once, all clusters in parallel
+    cluster_ids = list(dict.fromkeys(m[0] for m in monitored))
+    cluster_queues = {}
+    if cluster_ids:
+      with ThreadPoolExecutor(max_workers=min(len(cluster_ids), FETCH_WORKERS)) as executor:
+        cluster_queues = dict(zip(cluster_ids, executor.map(self._get_cluster_queues, cluster_ids)))
+    
+    results_append = results.append
+    for cluster_id, vhost, queue_name, zabbix_host in monitored:
+      # Look up queue info from the cluster-wide listing
+      queue_info = cluster_queues[cluster_id].get((vhost, queue_name))
+      if queue_info is None:
         continue
       
       # Extract metrics
-      messages = queue_info.get('messages', 0)
-      consumers = queue_info.get('consumers', 0)
-      state = queue_info.get('state', 'unknown')
+      messages, consumers, state = _queue_metrics(queue_info)
       
       # Create data points for Zabbix
-      results.append({
+      results_append({
         'host': zabbix_host,
         'metrics': {
           'queue.messages': messages,
@@ -87,7 +325,7 @@ class MonitoringService:
     
     return results
   
-  def send_metrics_to_zabbix(self, metrics: List[Dict]) -> Dict:
+  def send_metrics_to_zabbix(self, metrics: List[QueueMetric]) -> Dict:
     """
     Send collected metrics to Zabbix
     
@@ -97,43 +335,33 @@ class MonitoringService:
     Returns:
         Dict with success status and results
     """
-    zabbix_data_points = []
-    alert_data = []
-    
-    for metric in metrics:
-      host = metric.get('host')
-      queue_info = metric.get('queue_info', {})
-      
-      # Add data points for Zabbix
-      for key, value in metric.get('metrics', {}).items():
-        # Create a key specific to this queue
-        item_key = f"rabbitmq.{queue_info.get('vhost')}.{queue_info.get('queue')}.{key}"
-        zabbix_data_points.append({
-          'host': host,
-          'key': item_key,
-          'value': value
-        })
-      
-      # Check thresholds for alerting
-      messages = queue_info.get('messages', 0)
-      if messages > self.threshold:
-        alert_data.append({
-          'type': 'threshold',
-          'queue_info': queue_info
-        })
+    # Data points for Zabbix, with keys specific to each queue
+    zabbix_data_points: List[DataPoint] = []
+    append = zabbix_data_points.append
+    for m in metrics:
+      host = m['host']
+      queue_info = m['queue_info']
+      # The key prefix is the same for every metric of a queue
+      prefix = "rabbitmq." + queue_info['vhost'] + "." + queue_info['queue'] + "."
+      for key, value in m['metrics'].items():
+        append({'host': host, 'key': prefix + key, 'value': value})
     
     # Send data to Zabbix
     result = self.zabbix_client.send_values_to_zabbix(zabbix_data_points)
     
     # Send alerts if needed
-    for alert in alert_data:
-      self.notification_client.send_alert(
-        alert.get('type'), 
-        alert.get('queue_info')
-      )
+    self._dispatch_alerts(self._threshold_alerts(metrics))
     
     return result
   
+  @staticmethod
+  def build_data_points(metrics: List[QueueMetric]) -> List[DataPoint]:
+    """Flatten collected metrics into Zabbix data points (host, key, value)"""
+    return [
+      {'host': m['host'], 'key': key, 'value': value}
+      for m in metrics for key, value in m['metrics'].items()
+    ]
+  
   def run_monitoring_cycle(self) -> Dict:
     """
     Run a complete monitoring cycle:
@@ -152,65 +380,54 @@ class MonitoringService:
       'zabbix_result': result,
       'success': result.get('success', False)
     }
-
-  def collect_all_queue_metrics(self) -> List[Dict]:
+  
+  def collect_all_queue_metrics(self, on_metric: Optional[Callable[[QueueMetric], None]] = None) -> List[QueueMetric]:
     """
     Collect metrics for ALL queues on ALL vhosts on ALL clusters
     
+    Args:
+        on_metric: Optional callback receiving each metric as soon as its
+            cluster has been processed
+    
     Returns:
         List of queue metric data points
     """
-    results = []
+    results: List[QueueMetric] = []
+    results_append = results.append
+    queue_host_map = self._queue_host_map
     
-    # Iterate through all clusters
-    for cluster in self.config.get('rabbitmq', {}).get('clusters', []):
-      cluster_id = cluster.get('id')
-      
-      # Skip clusters without monitoring enabled
-      if not cluster.get('monitoring', {}).get('enabled', False):
-        continue
-      
-      # Get default Zabbix host for this cluster
-      default_zabbix_host = cluster.get('monitoring', {}).get('default_zabbix_host')
-      
-      # Get all queues from this cluster
-      all_queues = self.rabbitmq_client.get_all_queues(cluster_id)
-      
-      # Skip if there was an error
-      if isinstance(all_queues, dict) and "error" in all_queues:
-        continue
+    default_hosts = self._default_zabbix_hosts
+    
+    # Fetch all clusters concurrently, processing each as soon as it is in
+    for cluster_id, all_queues in self.rabbitmq_client.fetch_all_queues(list(default_hosts)):
+      default_zabbix_host = default_hosts[cluster_id]
       
       # Process each queue
+      cluster_start = len(results)
       for queue_info in all_queues:
         vhost = queue_info.get('vhost', '')
         queue_name = queue_info.get('name', '')
         
-        # Find the correct Zabbix host
-        zabbix_host = default_zabbix_host
-        
-        # Try to find a specific mapping for this queue in the config
-        for q_config in self.monitoring_config.get('queues', []):
-          if (q_config.get('vhost') == vhost and 
-              q_config.get('queue') == queue_name):
-            zabbix_host = q_config.get('zabbix_host', zabbix_host)
-            break
+        # Use the queue's configured Zabbix host, else the cluster default
+        zabbix_host = queue_host_map.get((vhost, queue_name), default_zabbix_host)
         
         # If we don't have a Zabbix host, skip this queue
         if not zabbix_host:
           continue
         
         # Extract metrics
-        messages = queue_info.get('messages', 0)
-        consumers = queue_info.get('consumers', 0)
-        state = queue_info.get('state', 'unknown')
+        messages, consumers, state = _queue_metrics(queue_info)
+        
+        # Item key parameters shared by all metrics of this queue
+        params = f'[{vhost},{queue_name}]'
         
         # Create data points for Zabbix with the required key format
-        results.append({
+        results_append({
           'host': zabbix_host,
           'metrics': {
-            f'rabbitmq.test.queue.size[{vhost},{queue_name}]': messages,
-            f'rabbitmq.test.queue.consumers[{vhost},{queue_name}]': consumers,
-            f'rabbitmq.test.queue.state[{vhost},{queue_name}]': 1 if state == 'running' else 0
+            'rabbitmq.test.queue.size' + params: messages,
+            'rabbitmq.test.queue.consumers' + params: consumers,
+            'rabbitmq.test.queue.state' + params: 1 if state == 'running' else 0
           },
           'queue_info': {
             'vhost': vhost,
@@ -220,6 +437,10 @@ class MonitoringService:
             'state': state
           }
         })
+      
+      if on_metric:
+        for metric in results[cluster_start:]:
+          on_metric(metric)
     
     return results
 
@@ -230,46 +451,19 @@ class MonitoringService:
     Returns:
         Dict with success status and results
     """
-    # Collect all metrics
-    metrics = self.collect_all_queue_metrics()
-    
-    # Prepare data for Zabbix
-    zabbix_data_points = []
-    alert_data = []
-    
-    for metric in metrics:
-      host = metric.get('host')
-      queue_info = metric.get('queue_info', {})
-      
-      # Add data points for Zabbix
-      for key, value in metric.get('metrics', {}).items():
-        zabbix_data_points.append({
-          'host': host,
-          'key': key,
-          'value': value
-        })
-      
-      # Check thresholds for alerting
-      messages = queue_info.get('messages', 0)
-      if messages > self.threshold:
-        alert_data.append({
-          'type': 'threshold',
-          'queue_info': queue_info
-        })
-    
-    # Send data to Zabbix
-    result = self.zabbix_client.send_values_to_zabbix(zabbix_data_points)
+    # Collect all metrics, sending each cluster's data points while the next one is fetched
+    stream = ZabbixStream(self.zabbix_client)
+    try:
+      metrics = self.collect_all_queue_metrics(on_metric=stream.put_metric)
+    finally:
+      result = stream.close()
     
     # Send alerts if needed
-    for alert in alert_data:
-      self.notification_client.send_alert(
-        alert.get('type'), 
-        alert.get('queue_info')
-      )
+    self._dispatch_alerts(self._threshold_alerts(metrics))
     
     return {
       'metrics_collected': len(metrics),
-      'data_points_sent': len(zabbix_data_points),
+      'data_points_sent': stream.sent,
       'zabbix_result': result,
       'success': result.get('success', False)
     }  
@@ -283,28 +477,25 @@ class MonitoringService:
     """
     alerts = []
     
-    for queue_config in self.monitoring_config.get('queues', []):
-      vhost = queue_config.get('vhost')
-      queue_name = queue_config.get('queue')
-      zabbix_host = queue_config.get('zabbix_host')
-      cluster_node = queue_config.get('cluster_node')
-      
-      if not all([vhost, queue_name, zabbix_host]):
-        continue
-      
-      # Create the Zabbix item key for this queue
-      item_key = f"rabbitmq.test.queue.size[{vhost},{queue_name}]"
-      
-      # Get the last two values from Zabbix
-      history = self.zabbix_client.get_item_history(zabbix_host, item_key, 2)
-      
-      if len(history) < 2:
+    # Item keys of the monitored queues, built once from the config
+    monitored = self._drift_items
+    
+    # Fetch last/previous values for all items with a single item.get
+    items = self.zabbix_client.resolve_items(
+      [(zabbix_host, item_key) for _, _, zabbix_host, _, item_key in monitored]
+    )
+    
+    # Current timestamp for alerts, shared by every alert of this cycle
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    for vhost, queue_name, zabbix_host, cluster_node, item_key in monitored:
+      item = items.get((zabbix_host, item_key))
+      if not item or not self._has_two_values(item):
         # Not enough history to determine drift
         continue
       
-      # Get the values (newest first)
-      latest_value = float(history[0].get('value', 0))
-      previous_value = float(history[1].get('value', 0))
+      latest_value = float(item.get('lastvalue') or 0)
+      previous_value = float(item.get('prevvalue') or 0)
       
       # Check for drift (latest value > previous value)
       has_drift = latest_value > previous_value
@@ -312,10 +503,6 @@ class MonitoringService:
       # Check for threshold violation
       threshold_exceeded = has_drift and (latest_value > self.threshold)
       
-      # Current timestamp for alerts
-      from datetime import datetime
-      current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-      
       # Queue context for notification - using keys that match the template
       queue_context = {
         'node': cluster_node,
@@ -343,6 +530,27 @@ class MonitoringService:
     
     return alerts
 
+  def _has_two_values(self, item: Dict) -> bool:
+    """
+    Whether an item.get result holds a last and a previous value
+    
+    Zabbix reports a missing value as "0" with clock "0" rather than null.
+    Servers that leave out prevclock are asked for history only when the
+    previous value reads 0, so growth from a really empty queue still counts.
+    """
+    if item.get('lastclock', '0') in ('0', None):
+      return False
+    
+    prevclock = item.get('prevclock')
+    if prevclock is not None:
+      return prevclock != '0'
+    
+    if item.get('prevvalue') is None:
+      return False
+    if float(item.get('prevvalue') or 0) != 0:
+      return True
+    return self.zabbix_client.has_previous_value(item)
+  
   def process_queue_alerts(self) -> Dict:
     """
     Process all queue alerts (drift and threshold) and send notifications
@@ -355,11 +563,10 @@ class MonitoringService:
     
     # Send notifications for each alert
     notification_results = []
-    for alert in alerts:
+    for alert, result in zip(alerts, self._dispatch_alerts(alerts)):
       alert_type = alert.get('type')
       queue_info = alert.get('queue_info', {})
       
-      result = self.notification_client.send_alert(alert_type, queue_info)
       notification_results.append({
         'type': alert_type,
         'queue': f"{queue_info.get('vhost')}/{queue_info.get('queue')}",
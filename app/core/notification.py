@@ -1,9 +1,11 @@
+import logging
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Dict, List, Any, Optional
+from email.message import EmailMessage
+from typing import Dict, List, Any, Optional, Tuple
 from string import Template
+from app.core.smtp import SMTPPool
+
+logger = logging.getLogger(__name__)
 
 class NotificationClient:
   def __init__(self, config: Dict):
@@ -15,62 +17,79 @@ class NotificationClient:
     self.from_address = self.config.get('from_address')
     self.templates = self.config.get('templates', {})
     self.alerts = self.config.get('alerts', {})
+    # Alert subjects with whether they contain format fields, checked once
+    self._subjects: Dict[str, Tuple[str, bool]] = {}
+    for name, alert_config in self.alerts.items():
+      subject = alert_config.get('subject', '')
+      self._subjects[name] = (subject, '{' in subject or '}' in subject)
+    # Compiled templates keyed by template name with the file mtime they were read at
+    self._template_cache: Dict[str, Tuple[float, Template]] = {}
+    self.pool_size = int(self.config.get('pool_size', 4))
+    # SMTP sessions reused across alerts
+    self._smtp = SMTPPool(
+      self.smtp_server, self.smtp_port, self.smtp_user, self.smtp_password,
+      size=self.pool_size,
+      max_messages=int(self.config.get('max_messages_per_connection', 100))
+    )
   
   def _load_template(self, template_name: str) -> Optional[Template]:
-    """Load an email template from file"""
+    """Load an email template from file, reloading it when the file changes"""
     template_path = self.templates.get(template_name)
     if not template_path:
       return None
       
     try:
+      mtime = os.stat(template_path).st_mtime
+      cached = self._template_cache.get(template_name)
+      if cached is not None and cached[0] == mtime:
+        return cached[1]
+      
       with open(template_path, 'r') as file:
-        return Template(file.read())
+        template = Template(file.read())
+      self._template_cache[template_name] = (mtime, template)
+      return template
     except Exception as e:
-      print(f"Error loading template {template_path}: {str(e)}")
+      logger.error("Error loading template %s: %s", template_path, e)
       return None
   
-  def send_alert(self, alert_type: str, context: Dict) -> Dict:
+  def _build_alert(self, alert_type: str, context: Dict) -> Tuple[Optional[EmailMessage], List[str], Optional[Dict]]:
     """
-    Send an alert email
+    Build the alert email for an alert type
     
-    Args:
-        alert_type: Type of alert (drift, threshold, error)
-        context: Dictionary of values to substitute in the template
-        
     Returns:
-        Dict with success status and message
+        Tuple of (message, recipients, error result), the message is None on error
     """
     if alert_type not in self.alerts:
-      return {"success": False, "error": f"Unknown alert type: {alert_type}"}
+      return None, [], {"success": False, "error": f"Unknown alert type: {alert_type}"}
     
     alert_config = self.alerts[alert_type]
     template_name = alert_config.get('template')
-    subject_template = alert_config.get('subject', '')
+    subject_template, subject_has_fields = self._subjects[alert_type]
     to_addresses = alert_config.get('to', [])
     cc_addresses = alert_config.get('cc', [])
     
     if not to_addresses:
-      return {"success": False, "error": "No recipients specified"}
+      return None, [], {"success": False, "error": "No recipients specified"}
     
     # Load the email template
     template = self._load_template(template_name)
     if not template:
-      return {"success": False, "error": f"Failed to load template: {template_name}"}
+      return None, [], {"success": False, "error": f"Failed to load template: {template_name}"}
     
     # Create the email
-    msg = MIMEMultipart()
+    msg = EmailMessage()
     msg['From'] = self.from_address
     msg['To'] = ', '.join(to_addresses)
     if cc_addresses:
       msg['Cc'] = ', '.join(cc_addresses)
     
-    # Format the subject
+    # Format the subject, plain subjects are used as-is
     try:
-      subject = subject_template.format(**context)
+      subject = subject_template.format_map(context) if subject_has_fields else subject_template
     except Exception as e:
       # If formatting fails, use the template as-is
       subject = subject_template
-      print(f"Subject formatting error: {str(e)}")
+      logger.warning("Subject formatting error: %s", e)
     
     msg['Subject'] = subject
     
@@ -79,25 +98,35 @@ class NotificationClient:
       body = template.substitute(**context)
     except KeyError as e:
       # Log the missing key and context
-      print(f"Template error - missing key: {str(e)}")
-      print(f"Available context keys: {list(context.keys())}")
-      return {"success": False, "error": f"Error formatting template: Missing key {str(e)}"}
+      logger.error("Template error - missing key: %s", e)
+      logger.error("Available context keys: %s", list(context))
+      return None, [], {"success": False, "error": f"Error formatting template: Missing key {str(e)}"}
     except Exception as e:
-      return {"success": False, "error": f"Error formatting template: {str(e)}"}
+      return None, [], {"success": False, "error": f"Error formatting template: {str(e)}"}
+    
+    msg.set_content(body, subtype='html')
+    
+    return msg, to_addresses + cc_addresses, None
+  
+  def send_alert(self, alert_type: str, context: Dict) -> Dict:
+    """
+    Send an alert email
     
-    msg.attach(MIMEText(body, 'html'))
+    Args:
+        alert_type: Type of alert (drift, threshold, error)
+        context: Dictionary of values to substitute in the template
+        
+    Returns:
+        Dict with success status and message
+    """
+    msg, all_recipients, error = self._build_alert(alert_type, context)
+    if error:
+      return error
     
     # Send the email
     try:
-      smtp = smtplib.SMTP(self.smtp_server, self.smtp_port)
-      
-      if self.smtp_user and self.smtp_password:
-        smtp.login(self.smtp_user, self.smtp_password)
-      
-      all_recipients = to_addresses + cc_addresses
-      smtp.sendmail(self.from_address, all_recipients, msg.as_string())
-      smtp.quit()
+      self._smtp.send_message(msg, self.from_address, all_recipients)
       
-      return {"success": True, "message": f"Alert sent to {', '.join(to_addresses)}"}
+      return {"success": True, "message": f"Alert sent to {msg['To']}"}
     except Exception as e:
-      return {"success": False, "error": f"Failed to send email: {str(e)}"}
\ No newline at end of file
+      return {"success": False, "error": f"Failed to send email: {str(e)}"}
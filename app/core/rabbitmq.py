@@ -1,6 +1,62 @@
 import requests
 import json
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+try:
+  import orjson
+except ImportError:  # optional, the stdlib decoder is used without it
+  orjson = None
+
+# Connections kept per management API host, sized for concurrent polls
+POOL_SIZE = 16
+
+# (connect, read) timeout in seconds for management API calls
+REQUEST_TIMEOUT = (2, 10)
+
+# Retries for transient gateway errors, idempotent GETs only. Connect errors and
+# read timeouts are not retried here: they fail over to the next node instead
+RETRIES = Retry(
+  total=3, connect=0, read=0, backoff_factor=0.2,
+  status_forcelist=[502, 503, 504], allowed_methods=['GET']
+)
+
+# (connect, read) timeout for health probes, tighter than REQUEST_TIMEOUT since
+# a health endpoint that hangs (e.g. during queue sync) already means unhealthy
+HEALTH_CHECK_TIMEOUT = (1, 3)
+
+# Seconds a node that failed a request is skipped before it is tried again
+NODE_BACKOFF = 5
+
+# Management API health checks a node must pass, all cheap and read-only.
+# node-is-quorum-critical is left out: it fails on healthy nodes whenever a
+# peer is down, which would push every remaining node into failover backoff.
+HEALTH_CHECKS = (
+  'alarms',
+  'local-alarms',
+  'protocol-listener/amqp',
+  'virtual-hosts'
+)
+
+# Queue fields requested from /api/queues, the broker leaves out all other stats
+QUEUE_COLUMNS = 'name,vhost,messages,messages_ready,consumers,state'
+
+# Default seconds a cluster's /api/queues listing is reused for further lookups,
+# overridable with rabbitmq.queues_cache_ttl
+QUEUES_CACHE_TTL = 2
+
+
+@lru_cache(maxsize=4096)
+def quote_path_segment(value: str) -> str:
+  """Percent-encode a vhost or queue name for a management API path, cached per name"""
+  return quote(value, safe='')
 
 
 class RabbitMQClient:
@@ -8,23 +64,65 @@ class RabbitMQClient:
     self.config = config
     self.clusters = config.get('rabbitmq', {}).get('clusters', [])
     
+    # Shared session so management API calls reuse keep-alive connections
+    self.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=RETRIES)
+    self.session.mount('http://', adapter)
+    self.session.mount('https://', adapter)
+    
+    # Health probes get one attempt within HEALTH_CHECK_TIMEOUT, a 503 already
+    # means the check failed
+    self._probe_session = requests.Session()
+    probe_adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+    self._probe_session.mount('http://', probe_adapter)
+    self._probe_session.mount('https://', probe_adapter)
+    
+    # Cluster, node and primary node lookups by ID/hostname, first match wins
+    self._cluster_by_id: Dict[str, Dict] = {}
+    self._node_by_host: Dict[Tuple[str, str], Dict] = {}
+    self._primary_node: Dict[str, Dict] = {}
+    self._node_order: Dict[str, deque] = {}
+    # Hostname -> monotonic time until which the node is skipped
+    self._bad_until: Dict[str, float] = {}
+    self._order_lock = threading.Lock()
+    for cluster in self.clusters:
+      cluster_id = cluster.get('id')
+      if cluster_id in self._cluster_by_id:
+        continue
+      self._cluster_by_id[cluster_id] = cluster
+      
+      nodes = cluster.get('nodes', [])
+      for node in nodes:
+        self._node_by_host.setdefault((cluster_id, node.get('hostname')), node)
+      
+      # If no primary specified, use the first node
+      primary = next((n for n in nodes if n.get('primary', False)), nodes[0] if nodes else None)
+      if primary is not None:
+        self._primary_node[cluster_id] = primary
+        # Failover order, primary first; failed nodes are moved to the back
+        self._node_order[cluster_id] = deque([primary] + [n for n in nodes if n is not primary])
+    
+    # Last get_all_queues error per cluster ID, cleared on the next successful call
+    self.last_errors: Dict[str, str] = {}
+    
+    # GET requests in flight, keyed by (cluster ID, path)
+    self._inflight: Dict[Tuple[str, str], Future] = {}
+    self._inflight_lock = threading.Lock()
+    
+    # Workers for per-node calls, no more than the session keeps connections for
+    self._pool = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='rabbitmq')
+    
+    # Cluster ID -> (expiry, queue listing, listing indexed by (vhost, name))
+    self.queues_cache_ttl = float(config.get('rabbitmq', {}).get('queues_cache_ttl', QUEUES_CACHE_TTL))
+    self._queues_cache: Dict[str, Tuple[float, List[Dict], Dict[Tuple[str, str], Dict]]] = {}
+    
   def get_cluster_by_id(self, cluster_id: str) -> Optional[Dict]:
     """Get cluster config by its ID"""
-    for cluster in self.clusters:
-      if cluster.get('id') == cluster_id:
-        return cluster
-    return None
+    return self._cluster_by_id.get(cluster_id)
   
   def get_node_info(self, cluster_id: str, node_hostname: str) -> Optional[Dict]:
     """Get specific node info from a cluster"""
-    cluster = self.get_cluster_by_id(cluster_id)
-    if not cluster:
-      return None
-      
-    for node in cluster.get('nodes', []):
-      if node.get('hostname') == node_hostname:
-        return node
-    return None
+    return self._node_by_host.get((cluster_id, node_hostname))
   
   def get_auth_for_cluster(self, cluster_id: str) -> Tuple[str, str]:
     """Get auth credentials for a cluster"""
@@ -36,61 +134,217 @@ class RabbitMQClient:
     return auth.get('user'), auth.get('password')
   
   def get_primary_node(self, cluster_id: str) -> Optional[Dict]:
-    """Get primary node for a cluster"""
-    cluster = self.get_cluster_by_id(cluster_id)
-    if not cluster:
-      return None
+    """Get primary node for a cluster, the first node if none is marked primary"""
+    return self._primary_node.get(cluster_id)
+  
+  def _make_request(self, cluster_id: str, path: str, auth: Tuple[str, str]) -> Any:
+    """
+    GET a management API path from a cluster, sharing the result
+    
+    Concurrent callers asking for the same path wait for the one request in
+    flight instead of sending their own. Callers must not modify the result.
+    
+    Returns:
+        Decoded JSON response
+        
+    Raises:
+        requests.exceptions.RequestException: if no node answered successfully
+    """
+    key = (cluster_id, path)
+    with self._inflight_lock:
+      future = self._inflight.get(key)
+      owner = future is None
+      if owner:
+        future = self._inflight[key] = Future()
+    
+    if not owner:
+      return future.result()
+    
+    try:
+      result = self._fetch(cluster_id, path, auth)
+    except BaseException as e:
+      future.set_exception(e)
+      raise
+    else:
+      future.set_result(result)
+      return result
+    finally:
+      with self._inflight_lock:
+        self._inflight.pop(key, None)
+  
+  def _fetch(self, cluster_id: str, path: str, auth: Tuple[str, str]) -> Any:
+    """
+    GET a management API path from a cluster, failing over across its nodes
+    
+    Nodes that failed within the last NODE_BACKOFF seconds are skipped unless
+    every node did. Client errors (4xx) are raised without failover.
+    
+    Returns:
+        Decoded JSON response
+        
+    Raises:
+        requests.exceptions.RequestException: if no node answered successfully
+    """
+    with self._order_lock:
+      nodes = list(self._node_order[cluster_id])
+    
+    now = time.monotonic()
+    bad_until = self._bad_until
+    candidates = [n for n in nodes if bad_until.get(n['hostname'], 0) <= now] or nodes
+    
+    last_error = None
+    for node in candidates:
+      api_url = f"http://{node['hostname']}:{node['api_port']}/api/{path}"
+      try:
+        response = self.session.get(api_url, auth=auth, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        # Bulk listings run to hundreds of KB, decode with orjson when available
+        if orjson is not None:
+          try:
+            return orjson.loads(response.content)
+          except orjson.JSONDecodeError as e:
+            # Fail over like response.json() does on a garbled body
+            raise requests.exceptions.InvalidJSONError(str(e), response=response) from e
+        return response.json()
+      except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code < 500:
+          raise
+        last_error = e
+      except requests.exceptions.RequestException as e:
+        last_error = e
       
-    for node in cluster.get('nodes', []):
-      if node.get('primary', False):
-        return node
-    # If no primary specified, return first node
-    if cluster.get('nodes'):
-      return cluster.get('nodes')[0]
-    return None
+      # Skip this node for a while and try it last from now on
+      bad_until[node['hostname']] = time.monotonic() + NODE_BACKOFF
+      with self._order_lock:
+        order = self._node_order[cluster_id]
+        if node in order:
+          order.remove(node)
+          order.append(node)
+    
+    raise last_error
+  
+  def _run_health_check(self, cluster_id: str, node: Dict, check: str) -> bool:
+    """Run one /api/health/checks/<check> probe against a node"""
+    user, password = self.get_auth_for_cluster(cluster_id)
+    api_url = f"http://{node['hostname']}:{node['api_port']}/api/health/checks/{check}"
+    
+    try:
+      response = self._probe_session.get(api_url, auth=(user, password), timeout=HEALTH_CHECK_TIMEOUT)
+      return response.status_code == 200
+    except requests.exceptions.RequestException:
+      return False
+  
+  def _record_health(self, node: Dict, healthy: bool) -> None:
+    """Feed a health check result into request failover"""
+    if healthy:
+      self._bad_until.pop(node['hostname'], None)
+    else:
+      self._bad_until[node['hostname']] = time.monotonic() + NODE_BACKOFF
+  
+  def check_all_nodes_health(self) -> Dict[str, Dict[str, bool]]:
+    """
+    Check every node of every cluster, all probes running concurrently
+    
+    Returns:
+        Dict mapping cluster ID to a dict of node hostname -> healthy
+    """
+    targets = [
+      (cluster_id, node, check)
+      for cluster_id, nodes in self._node_order.items()
+      for node in list(nodes)
+      for check in HEALTH_CHECKS
+    ]
+    results = self._pool.map(lambda t: self._run_health_check(*t), targets)
+    
+    health: Dict[str, Dict[str, bool]] = {}
+    nodes = {}
+    for (cluster_id, node, _), passed in zip(targets, results):
+      cluster_health = health.setdefault(cluster_id, {})
+      cluster_health[node['hostname']] = cluster_health.get(node['hostname'], True) and passed
+      nodes[node['hostname']] = node
+    
+    for cluster_health in health.values():
+      for hostname, healthy in cluster_health.items():
+        self._record_health(nodes[hostname], healthy)
+    return health
   
   def get_queue_info(self, cluster_id: str, vhost: str, queue_name: str) -> Dict:
     """
     Get information about a specific queue in a RabbitMQ cluster
     """
-    node = self.get_primary_node(cluster_id)
-    if not node:
+    if cluster_id not in self._node_order:
       return {"error": "Cluster not found or no nodes available"}
       
     user, password = self.get_auth_for_cluster(cluster_id)
     if not user or not password:
       return {"error": "Auth information not available"}
     
-    # URL encode vhost for API call
-    import urllib.parse
-    encoded_vhost = urllib.parse.quote(vhost, safe='')
+    # Serve from a fresh cluster-wide listing when there is one
+    cached = self._queues_cache.get(cluster_id)
+    if cached and cached[0] > time.monotonic():
+      queue_info = cached[2].get((vhost, queue_name))
+      if queue_info is not None:
+        return queue_info
     
-    api_url = f"http://{node['hostname']}:{node['api_port']}/api/queues/{encoded_vhost}/{queue_name}"
+    # URL encode vhost and queue name for API call
+    encoded_vhost = quote_path_segment(vhost)
+    encoded_queue = quote_path_segment(queue_name)
     
     try:
-      response = requests.get(api_url, auth=(user, password))
-      response.raise_for_status()
-      return response.json()
+      return self._make_request(cluster_id, f"queues/{encoded_vhost}/{encoded_queue}", (user, password))
     except requests.exceptions.RequestException as e:
       return {"error": f"Failed to get queue info: {str(e)}"}
   
   def get_all_queues(self, cluster_id: str) -> List[Dict]:
     """
     Get all queues from a RabbitMQ cluster
+    
+    Only the QUEUE_COLUMNS fields of each queue are fetched.
+    Always returns a list, empty if the queues could not be fetched. The
+    reason is kept in last_errors[cluster_id]. A listing younger than
+    queues_cache_ttl seconds is returned without a new request.
     """
-    node = self.get_primary_node(cluster_id)
-    if not node:
-      return {"error": "Cluster not found or no nodes available"}
+    cached = self._queues_cache.get(cluster_id)
+    if cached and cached[0] > time.monotonic():
+      return cached[1]
+    
+    if cluster_id not in self._node_order:
+      return self._queues_error(cluster_id, "Cluster not found or no nodes available")
       
     user, password = self.get_auth_for_cluster(cluster_id)
     if not user or not password:
-      return {"error": "Auth information not available"}
-    
-    api_url = f"http://{node['hostname']}:{node['api_port']}/api/queues"
+      return self._queues_error(cluster_id, "Auth information not available")
     
     try:
-      response = requests.get(api_url, auth=(user, password))
-      response.raise_for_status()
-      return response.json()
+      queues = self._make_request(cluster_id, "queues?columns=" + QUEUE_COLUMNS, (user, password))
     except requests.exceptions.RequestException as e:
-      return {"error": f"Failed to get all queues: {str(e)}"}
\ No newline at end of file
+      return self._queues_error(cluster_id, f"Failed to get all queues: {str(e)}")
+    
+    self.last_errors.pop(cluster_id, None)
+    index = {(q.get('vhost'), q.get('name')): q for q in queues}
+    self._queues_cache[cluster_id] = (time.monotonic() + self.queues_cache_ttl, queues, index)
+    return queues
+  
+  def fetch_all_queues(self, cluster_ids: List[str]) -> Iterator[Tuple[str, List[Dict]]]:
+    """
+    Fetch the queues of several clusters concurrently
+    
+    All requests are started right away; results are yielded as
+    (cluster_id, queues) in the order of cluster_ids, so the first cluster
+    can be processed while the others are still in flight.
+    """
+    futures = [self._pool.submit(self.get_all_queues, cluster_id) for cluster_id in cluster_ids]
+    return zip(cluster_ids, (future.result() for future in futures))
+  
+  def get_queue_index(self, cluster_id: str) -> Dict[Tuple[str, str], Dict]:
+    """Get all queues of a cluster indexed by (vhost, queue name), empty on error"""
+    self.get_all_queues(cluster_id)
+    cached = self._queues_cache.get(cluster_id)
+    if not cached or cluster_id in self.last_errors:
+      return {}
+    return cached[2]
+  
+  def _queues_error(self, cluster_id: str, error: str) -> List[Dict]:
+    """Record a get_all_queues failure for a cluster and return no queues"""
+    self.last_errors[cluster_id] = error
+    return []
@@ -0,0 +1,131 @@
+import atexit
+import io
+import queue
+import smtplib
+import threading
+import time
+from email.generator import BytesGenerator
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+from typing import List, Optional
+
+# Seconds a connection may sit unused before it is closed instead of reused
+IDLE_TIMEOUT = 100
+
+# Messages sent over one connection before it is recycled, many servers limit this
+MAX_MESSAGES_PER_CONNECTION = 100
+
+def flatten(message: EmailMessage) -> bytes:
+  """Serialise a message to wire format (CRLF line endings) in one pass"""
+  buf = io.BytesIO()
+  BytesGenerator(buf, policy=SMTP_POLICY).flatten(message)
+  return buf.getvalue()
+
+class SMTPConnection:
+  """
+  SMTP session that is opened lazily and reused across messages.
+
+  The session is reopened when it sat idle for longer than IDLE_TIMEOUT seconds
+  or already carried max_messages messages. A send on a session the server
+  dropped in the meantime is retried once on a new one.
+  """
+  def __init__(self, server: str, port: int, user: Optional[str] = None,
+               password: Optional[str] = None, starttls: bool = False,
+               max_messages: int = MAX_MESSAGES_PER_CONNECTION):
+    self.server = server
+    self.port = port
+    self.user = user
+    self.password = password
+    self.starttls = starttls
+    self.max_messages = max_messages
+
+    self._smtp: Optional[smtplib.SMTP] = None
+    self._last_used = 0.0
+    self._sent = 0
+    self._lock = threading.Lock()
+    atexit.register(self.close)
+
+  def _connect(self) -> smtplib.SMTP:
+    """Open and authenticate a new SMTP session"""
+    smtp = smtplib.SMTP(self.server, self.port)
+    if self.user and self.password:
+      if self.starttls:
+        smtp.starttls()
+      smtp.login(self.user, self.password)
+    return smtp
+
+  def _get(self) -> smtplib.SMTP:
+    """Return a live session, reconnecting if the cached one is stale"""
+    if self._smtp is not None:
+      if self._sent >= self.max_messages or time.monotonic() - self._last_used > IDLE_TIMEOUT:
+        self._close()
+
+    if self._smtp is None:
+      self._smtp = self._connect()
+      self._sent = 0
+    return self._smtp
+
+  def _close(self) -> None:
+    """Close the cached session, ignoring errors from a dead socket"""
+    if self._smtp is None:
+      return
+    try:
+      self._smtp.quit()
+    except (smtplib.SMTPException, OSError):
+      self._smtp.close()
+    self._smtp = None
+
+  def sendmail(self, from_address: str, recipients: List[str], data: bytes) -> None:
+    """Send an already flattened message, retrying once if the session was dropped"""
+    with self._lock:
+      try:
+        self._get().sendmail(from_address, recipients, data)
+      except (smtplib.SMTPServerDisconnected, ConnectionError):
+        self._close()
+        self._get().sendmail(from_address, recipients, data)
+      except OSError:
+        self._close()
+        raise
+      self._last_used = time.monotonic()
+      self._sent += 1
+
+  def send_message(self, message: EmailMessage, from_address: str, recipients: List[str]) -> None:
+    """Send a message over the shared session"""
+    # Flatten before taking the lock, and only once even if the send is retried
+    self.sendmail(from_address, recipients, flatten(message))
+
+  def close(self) -> None:
+    """Quit the session if one is open"""
+    with self._lock:
+      self._close()
+
+
+class SMTPPool:
+  """
+  Fixed-size pool of SMTPConnection objects so several alerts can be sent in parallel.
+  """
+  def __init__(self, server: str, port: int, user: Optional[str] = None,
+               password: Optional[str] = None, starttls: bool = False, size: int = 4,
+               max_messages: int = MAX_MESSAGES_PER_CONNECTION):
+    self.size = max(1, size)
+    # LIFO hands out the most recently used, still open, session first
+    self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=self.size)
+    for _ in range(self.size):
+      self._idle.put(SMTPConnection(server, port, user, password, starttls, max_messages))
+
+  def acquire(self) -> SMTPConnection:
+    """Take a connection from the pool, blocking until one is free"""
+    return self._idle.get()
+
+  def release(self, connection: SMTPConnection) -> None:
+    """Return a connection to the pool"""
+    self._idle.put(connection)
+
+  def send_message(self, message: EmailMessage, from_address: str, recipients: List[str]) -> None:
+    """Send a message over any free pooled connection"""
+    data = flatten(message)
+    connection = self.acquire()
+    try:
+      connection.sendmail(from_address, recipients, data)
+    finally:
+      self.release(connection)
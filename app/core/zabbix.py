@@ -1,10 +1,133 @@
+import hashlib
 import os
 import subprocess
 import json
-import tempfile
+import logging
+import socket
+import ssl
+import struct
+import threading
+import time
 import platform
+import re
+import shlex
 import shutil
-from typing import Dict, List, Any, Optional
+import stat
+import tempfile
+import weakref
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Any, Mapping, Optional, Sequence, Tuple, Union
+
+try:
+  import orjson
+except ImportError:  # optional, the stdlib encoder is used without it
+  orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Trapper protocol header: magic + flags, then little-endian data length and reserved field
+ZABBIX_HEADER = b'ZBXD\x01'
+ZABBIX_HEADER_LENGTH = 13
+_header_struct = struct.Struct('<5sII')
+
+# Seconds a zabbix_sender process may run before it is killed
+SENDER_PROCESS_TIMEOUT = 30
+
+# (connect, read) timeout in seconds for Zabbix API calls
+API_TIMEOUT = (3.05, 30)
+
+# Values per trapper request, the same limit zabbix_sender applies
+ZABBIX_SENDER_BATCH = 250
+
+# Seconds to wait for the Zabbix server to accept and answer a sender request
+ZABBIX_SENDER_TIMEOUT = 10
+
+# Seconds a saved login session is used without checking it first
+TOKEN_CACHE_FRESH = 600
+
+# Directory under the user's cache dir (XDG_CACHE_HOME or ~/.cache) the login session is saved in
+CACHE_DIR_NAME = 'rabbitmq-zabbix-monitor'
+
+# Not available on Windows, where the owner checks below are skipped as well
+_O_NOFOLLOW = getattr(os, 'O_NOFOLLOW', 0)
+
+# Encoded payloads are posted as raw bytes, so the content type is set explicitly
+JSON_RPC_HEADERS = {'Content-Type': 'application/json'}
+
+def _json_dumps(obj: Any) -> bytes:
+  """Serialise to UTF-8 JSON bytes, with orjson when it is installed"""
+  if orjson is not None:
+    return orjson.dumps(obj)
+  return json.dumps(obj).encode('utf-8')
+
+def _json_loads(data: memoryview) -> Any:
+  """Parse UTF-8 JSON from a bytes-like object, with orjson when it is installed"""
+  if orjson is not None:
+    return orjson.loads(data)
+  return json.loads(str(data, 'utf-8'))
+
+# Server reply zabbix_sender prints for each request it made
+_SENDER_REPLY = re.compile(r'processed: (\d+); failed: (\d+); total: (\d+)')
+
+def _sender_output_counts(output: str) -> Dict[str, int]:
+  """Sum the processed/failed/total counters of every reply in zabbix_sender output"""
+  counts: Dict[str, int] = {}
+  for processed, failed, total in _SENDER_REPLY.findall(output):
+    counts["processed"] = counts.get("processed", 0) + int(processed)
+    counts["failed"] = counts.get("failed", 0) + int(failed)
+    counts["total"] = counts.get("total", 0) + int(total)
+  return counts
+
+def _is_private(st: os.stat_result, mode: int) -> bool:
+  """Whether a stat result belongs to the current user and has exactly the given permissions"""
+  if not hasattr(os, 'getuid'):
+    return True
+  return st.st_uid == os.getuid() and stat.S_IMODE(st.st_mode) == mode
+
+def _private_cache_dir() -> Optional[str]:
+  """
+  Per-user cache directory for this service, created with mode 0700.
+  
+  None if it cannot be created or is not a real directory private to the user.
+  """
+  base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+  path = os.path.join(base, CACHE_DIR_NAME)
+  try:
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+  except OSError:
+    return None
+  if not stat.S_ISDIR(st.st_mode) or not _is_private(st, 0o700):
+    logger.warning("Not caching Zabbix session, %s is not a private directory", path)
+    return None
+  return path
+
+def _remove_file(path: str) -> None:
+  """Delete a file, ignoring one that is already gone"""
+  try:
+    os.unlink(path)
+  except OSError:
+    pass
+
+def _is_session_error(error: Dict) -> bool:
+  """Whether a JSON-RPC error means the login session expired or is not valid"""
+  data = str(error.get("data", ""))
+  return "re-login" in data or "Not authori" in data
+
+def _parse_sender_info(info: str) -> Dict[str, int]:
+  """Extract the processed/failed/total counters from a trapper response info string"""
+  counts = {}
+  for part in info.split(';'):
+    name, _, value = part.partition(':')
+    name = name.strip()
+    if name in ('processed', 'failed', 'total'):
+      try:
+        counts[name] = int(value)
+      except ValueError:
+        pass
+  return counts
 
 class ZabbixClient:
   def __init__(self, config: Dict):
@@ -24,11 +147,74 @@ class ZabbixClient:
     self.tls_psk_file_linux = self.config.get('tls_psk_file_linux')
     self.psk_key = self.config.get('psk_key')
     
+    # 'cli' always uses zabbix_sender, otherwise values are sent over a plain
+    # trapper socket unless PSK encryption is required
+    self.sender = self.config.get('sender', 'auto')
+    
+    # zabbix_sender and PSK file locations, resolved on first use. Misses are
+    # not remembered so a binary or key installed later is still picked up
+    self._sender_path: Optional[str] = None
+    self._psk_path: Optional[str] = None
+    # File descriptor or temp file holding psk_key when no PSK file is configured
+    self._psk_fd: Optional[int] = None
+    self._psk_tmp: Optional[str] = None
+    # Removes the temp file when the client is closed, collected or the interpreter exits
+    self._psk_tmp_cleanup: Optional[weakref.finalize] = None
+    
+    # TLS-PSK context for the trapper socket, built on first use (False: not available)
+    self._psk_context: Union[None, bool, ssl.SSLContext] = None
+    
+    # Per-thread receive buffer for trapper responses, grown on demand
+    self._recv_local = threading.local()
+    
+    # Resolved trapper address, looked up on first send and after a failed one
+    self._sender_addr: Optional[List[Tuple]] = None
+    
     # Authentication token
-    self._auth = None
+    self._auth: Optional[str] = None
+    
+    # Reuse the login session across processes through a file only the user can read
+    self.token_cache = self.config.get('token_cache', True)
+    
+    # Keep-alive session for JSON-RPC calls, created on first use
+    self._session = None
+  
+  def _get_session(self):
+    """Return the shared API session, creating it on first use"""
+    if self._session is None:
+      session = requests.Session()
+      adapter = HTTPAdapter(
+        pool_connections=10, pool_maxsize=10,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+      )
+      session.mount('http://', adapter)
+      session.mount('https://', adapter)
+      self._session = session
+    return self._session
+  
+  def close(self) -> None:
+    """Close the API session's pooled connections"""
+    if self._session is not None:
+      self._session.close()
+      self._session = None
+    if self._psk_fd is not None:
+      os.close(self._psk_fd)
+      self._psk_fd = None
+      self._psk_path = None
+    if self._psk_tmp_cleanup is not None:
+      self._psk_tmp_cleanup()
+      self._psk_tmp_cleanup = None
+      self._psk_tmp = None
+      self._psk_path = None
   
   def _find_zabbix_sender(self) -> Optional[str]:
-    """Find the zabbix_sender executable"""
+    """Find the zabbix_sender executable, remembering it once found"""
+    if self._sender_path is None:
+      self._sender_path = self._search_zabbix_sender()
+    return self._sender_path
+  
+  def _search_zabbix_sender(self) -> Optional[str]:
+    """Search PATH and the common install locations for zabbix_sender"""
     # Check if it's in the PATH
     zabbix_sender_path = shutil.which("zabbix_sender")
     if zabbix_sender_path:
@@ -55,14 +241,25 @@ class ZabbixClient:
     return None
   
   def _get_psk_file_path(self) -> Optional[str]:
-    """Get the path to the PSK file"""
+    """Get the path to the PSK file, remembering it once an existing file is found"""
+    if self._psk_path is not None:
+      return self._psk_path
+    
     # Check Windows/default path first
     if self.tls_psk_file and os.path.exists(self.tls_psk_file):
-      return self.tls_psk_file
+      self._psk_path = self.tls_psk_file
+      return self._psk_path
     
     # Check Linux path if on Linux
     if platform.system() != "Windows" and self.tls_psk_file_linux and os.path.exists(self.tls_psk_file_linux):
-      return self.tls_psk_file_linux
+      self._psk_path = self.tls_psk_file_linux
+      return self._psk_path
+    
+    # Only the key itself is configured, expose it to zabbix_sender once
+    if self.psk_key:
+      self._psk_path = self._write_psk_key()
+      if self._psk_path is not None:
+        return self._psk_path
     
     # Return the configured path even if it doesn't exist
     # This allows zabbix_sender to report the specific error
@@ -71,6 +268,109 @@ class ZabbixClient:
     else:
       return self.tls_psk_file
   
+  def _write_psk_key(self) -> Optional[str]:
+    """
+    Put psk_key into a file zabbix_sender can read and return its path.
+    
+    On Linux the key lives in an anonymous in-memory file (memfd) that the
+    sender opens through /proc, elsewhere in an owner-only temp file. Either
+    is created once and released by close(); the temp file is also removed
+    when the client is garbage collected or the interpreter exits.
+    """
+    data = self.psk_key.strip().encode('ascii')
+    
+    if hasattr(os, 'memfd_create'):
+      try:
+        fd = os.memfd_create('zabbix_psk', os.MFD_CLOEXEC)
+        os.write(fd, data)
+        self._psk_fd = fd
+        return f"/proc/{os.getpid()}/fd/{fd}"
+      except OSError as e:
+        logger.debug("memfd_create failed, using a temp file for the PSK: %s", e)
+    
+    try:
+      fd, path = tempfile.mkstemp(prefix='.zabbix-psk-')
+    except OSError as e:
+      logger.warning("Could not write Zabbix PSK file: %s", e)
+      return None
+    
+    # Registered before writing so a failed write does not leave the file behind
+    cleanup = weakref.finalize(self, _remove_file, path)
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+      self._psk_tmp = path
+      self._psk_tmp_cleanup = cleanup
+      return path
+    except OSError as e:
+      cleanup()
+      logger.warning("Could not write Zabbix PSK file: %s", e)
+      return None
+  
+  def _token_cache_path(self) -> Optional[str]:
+    """Per URL and user file the login session is cached in, None if there is no private cache dir"""
+    cache_dir = _private_cache_dir()
+    if cache_dir is None:
+      return None
+    digest = hashlib.sha256(f"{self.url}\0{self.user}".encode('utf-8')).hexdigest()[:32]
+    return os.path.join(cache_dir, f"zabbix-token-{digest}")
+  
+  def _load_cached_token(self) -> Tuple[Optional[str], float]:
+    """Read a previously saved login session, if any, and its age in seconds"""
+    path = self._token_cache_path()
+    if path is None:
+      return None, 0.0
+    
+    try:
+      fd = os.open(path, os.O_RDONLY | _O_NOFOLLOW)
+    except OSError:
+      return None, 0.0
+    
+    with os.fdopen(fd, 'r') as f:
+      st = os.fstat(f.fileno())
+      # Only trust a regular file this user wrote with owner-only permissions
+      if not stat.S_ISREG(st.st_mode) or not _is_private(st, 0o600):
+        logger.warning("Ignoring Zabbix session cache %s, it is not a private file of this user", path)
+        return None, 0.0
+      return f.read().strip() or None, time.time() - st.st_mtime
+  
+  def _save_cached_token(self, auth: str) -> None:
+    """Save the login session with owner-only permissions, replacing the file atomically"""
+    path = self._token_cache_path()
+    if path is None:
+      return
+    
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+    try:
+      fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | _O_NOFOLLOW, 0o600)
+      with os.fdopen(fd, 'w') as f:
+        f.write(auth)
+      os.replace(tmp_path, path)
+    except OSError as e:
+      logger.warning("Could not cache Zabbix session: %s", e)
+      try:
+        os.unlink(tmp_path)
+      except OSError:
+        pass
+  
+  def _drop_cached_token(self) -> None:
+    """Forget the saved login session"""
+    path = self._token_cache_path()
+    if path is None:
+      return
+    try:
+      os.unlink(path)
+    except OSError:
+      pass
+  
+  def _post(self, payload: Dict) -> Dict:
+    """POST a JSON-RPC payload and return the decoded response"""
+    response = self._get_session().post(
+      self.api_url, data=_json_dumps(payload), headers=JSON_RPC_HEADERS, timeout=API_TIMEOUT
+    )
+    response.raise_for_status()
+    return _json_loads(response.content)
+  
   def authenticate(self) -> Optional[str]:
     """Authenticate with Zabbix API and get auth token"""
     if not self.api_url:
@@ -80,29 +380,49 @@ class ZabbixClient:
       self._auth = self.token
       return self.token
     
-    payload = {
-      "jsonrpc": "2.0",
-      "method": "user.login",
-      "params": {
-        "user": self.user,
-        "password": self.password
-      },
-      "id": 1
-    }
-    
     try:
-      import requests
-      response = requests.post(self.api_url, json=payload)
-      response.raise_for_status()
-      data = response.json()
+      # A session saved by an earlier run is valid for a long time. A recently
+      # saved one is used as is (api_call logs in again if it expired), an
+      # older one is checked cheaply first
+      if self.token_cache:
+        cached, age = self._load_cached_token()
+        if cached and age < TOKEN_CACHE_FRESH:
+          self._auth = cached
+          return cached
+        if cached:
+          probe = self._post({
+            "jsonrpc": "2.0",
+            "method": "host.get",
+            "params": {"output": ["hostid"], "limit": 1},
+            "auth": cached,
+            "id": 1
+          })
+          if "result" in probe:
+            self._auth = cached
+            # Rewrite it so it counts as fresh again
+            self._save_cached_token(cached)
+            return cached
+          self._drop_cached_token()
+      
+      data = self._post({
+        "jsonrpc": "2.0",
+        "method": "user.login",
+        "params": {
+          "user": self.user,
+          "password": self.password
+        },
+        "id": 1
+      })
       
       if "result" in data:
         self._auth = data["result"]
+        if self.token_cache:
+          self._save_cached_token(self._auth)
         return self._auth
       
       return None
     except Exception as e:
-      print(f"Authentication error: {str(e)}")
+      logger.error("Authentication error: %s", e)
       return None
   
   def api_call(self, method: str, params: Dict) -> Dict:
@@ -113,19 +433,26 @@ class ZabbixClient:
     if not self._auth:
       return {"error": "Not authenticated"}
     
-    payload = {
-      "jsonrpc": "2.0",
-      "method": method,
-      "params": params,
-      "auth": self._auth,
-      "id": 1
-    }
-    
     try:
-      import requests
-      response = requests.post(self.api_url, json=payload)
-      response.raise_for_status()
-      return response.json()
+      for attempt in range(2):
+        data = self._post({
+          "jsonrpc": "2.0",
+          "method": method,
+          "params": params,
+          "auth": self._auth,
+          "id": 1
+        })
+        
+        # An expired login session: log in again once and repeat the call
+        error = data.get("error")
+        if attempt == 0 and not self.token and isinstance(error, dict) and _is_session_error(error):
+          self._auth = None
+          self._drop_cached_token()
+          if not self.authenticate():
+            return {"error": "Not authenticated"}
+          continue
+        return data
+      return data
     except Exception as e:
       return {"error": f"API call failed: {str(e)}"}
   
@@ -140,23 +467,229 @@ class ZabbixClient:
     
     return self.api_call("host.get", params)
   
-  def send_value(self, hostname: str, key: str, value: Any) -> Dict:
+  def resolve_items(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict]:
+    """
+    Resolve many (host, key) pairs with a single item.get call
+    
+    Args:
+        pairs: List of (hostname, item key) tuples
+        
+    Returns:
+        Dict mapping (hostname, key) to the item with itemid, lastvalue,
+        prevvalue and the clocks of those values
+    """
+    if not pairs:
+      return {}
+    
+    params = {
+      "output": ["itemid", "key_", "value_type", "lastvalue", "prevvalue", "lastclock", "prevclock"],
+      "selectHosts": ["hostid", "host"],
+      "filter": {
+        "host": sorted({host for host, _ in pairs}),
+        "key_": sorted({key for _, key in pairs})
+      }
+    }
+    
+    result = self.api_call("item.get", params)
+    
+    # The filter matches the cross product of hosts and keys, keep only requested pairs
+    wanted = set(pairs)
+    items = {}
+    for item in result.get("result", []):
+      for host in item.get("hosts", []):
+        pair = (host.get("host"), item.get("key_"))
+        if pair in wanted:
+          items[pair] = item
+    
+    return items
+  
+  def has_previous_value(self, item: Dict) -> bool:
+    """Whether an item from resolve_items has at least two values in history"""
+    history_params = {
+      "output": ["clock"],
+      "history": int(item.get("value_type", 3)),
+      "itemids": item.get("itemid"),
+      "sortfield": "clock",
+      "sortorder": "DESC",
+      "limit": 2
+    }
+    return len(self.api_call("history.get", history_params).get("result") or []) >= 2
+  
+  def _get_psk_context(self) -> Optional[ssl.SSLContext]:
+    """
+    Build the TLS-PSK client context once
+    
+    Returns None when this Python's ssl module has no PSK support (before
+    3.13) or the key cannot be read, zabbix_sender is used then.
     """
-    Send a value to Zabbix using zabbix_sender with PSK authentication
+    if self._psk_context is None:
+      self._psk_context = False
+      if hasattr(ssl.SSLContext, 'set_psk_client_callback'):
+        try:
+          psk_hex = self.psk_key
+          if not psk_hex:
+            psk_file = self._get_psk_file_path()
+            if not psk_file:
+              raise ValueError("no PSK key or PSK file configured")
+            with open(psk_file, 'r') as f:
+              psk_hex = f.read()
+          psk = bytes.fromhex(psk_hex.strip())
+          identity = self.tls_psk_identity
+          
+          context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+          context.check_hostname = False
+          context.verify_mode = ssl.CERT_NONE
+          # PSK callbacks are only reliable with TLS 1.2 PSK cipher suites
+          context.maximum_version = ssl.TLSVersion.TLSv1_2
+          context.set_ciphers('PSK')
+          context.set_psk_client_callback(lambda hint: (identity, psk))  # type: ignore[attr-defined]
+          self._psk_context = context
+        except (OSError, TypeError, ValueError, ssl.SSLError) as e:
+          logger.warning("TLS-PSK unavailable, falling back to zabbix_sender: %s", e)
+    
+    return self._psk_context if isinstance(self._psk_context, ssl.SSLContext) else None
+  
+  def uses_socket(self) -> bool:
+    """Whether values can be sent over the trapper socket instead of zabbix_sender"""
+    if self.sender == 'cli':
+      return False
+    return self.tls_connect != "psk" or self._get_psk_context() is not None
+  
+  def _recv_exact(self, sock: socket.socket, length: int) -> memoryview:
+    """
+    Read exactly length bytes into this thread's reusable buffer
+    
+    The returned view is only valid until the next read on the same thread.
+    Fails if the server closes the connection early.
+    """
+    buf = getattr(self._recv_local, 'buf', None)
+    if buf is None or len(buf) < length:
+      buf = self._recv_local.buf = bytearray(max(length, 4096))
+    
+    view = memoryview(buf)[:length]
+    received = 0
+    while received < length:
+      count = sock.recv_into(view[received:])
+      if not count:
+        raise ConnectionError("Connection closed by Zabbix server")
+      received += count
+    return view
+  
+  def _connect_sender(self) -> socket.socket:
+    """
+    Open a connection to the Zabbix trapper
+    
+    The server closes the connection after answering each request, so a
+    connection cannot be kept across requests; the address lookup is kept instead.
+    """
+    if self._sender_addr is None:
+      self._sender_addr = socket.getaddrinfo(self.server, int(self.port), type=socket.SOCK_STREAM)
+    
+    error = None
+    for family, socktype, proto, _, sockaddr in self._sender_addr:
+      sock = socket.socket(family, socktype, proto)
+      try:
+        sock.settimeout(ZABBIX_SENDER_TIMEOUT)
+        # Header and payload go out in one sendall, don't hold back the tail
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect(sockaddr)
+        return sock
+      except OSError as e:
+        sock.close()
+        error = e
+    
+    # Resolve again next time in case the server moved
+    self._sender_addr = None
+    raise error or OSError(f"No address found for {self.server}")
+  
+  def _send_packet(self, data_points: Sequence[Mapping[str, Any]]) -> Dict:
+    """Send one trapper request and return the server's decoded response"""
+    data = {
+      "request": "sender data",
+      "data": [
+        {"host": point['host'], "key": point['key'], "value": str(point['value'])}
+        for point in data_points
+      ]
+    }
+    if logger.isEnabledFor(logging.DEBUG):
+      logger.debug("Sending to Zabbix server: %s", data)
+    
+    json_data = _json_dumps(data)
+    packet = _header_struct.pack(ZABBIX_HEADER, len(json_data), 0) + json_data
+    
+    sock = self._connect_sender()
+    if self.tls_connect == "psk":
+      try:
+        context = self._get_psk_context()
+        if context is None:
+          raise ValueError("TLS-PSK is not available")
+        sock = context.wrap_socket(sock, server_hostname=self.server)
+      except (OSError, ValueError):
+        sock.close()
+        raise
+    
+    with sock:
+      sock.sendall(packet)
+      magic, length, _ = _header_struct.unpack_from(self._recv_exact(sock, ZABBIX_HEADER_LENGTH))
+      if magic != ZABBIX_HEADER:
+        raise ValueError("Invalid response header from Zabbix server")
+      return _json_loads(self._recv_exact(sock, length))
+  
+  def _send_with_socket(self, data_points: Sequence[Mapping[str, Any]]) -> Dict:
     """
-    # Find zabbix_sender
+    Send data points to the Zabbix server with the trapper protocol,
+    ZABBIX_SENDER_BATCH values per request
+    
+    Args:
+        data_points: List of dictionaries with keys: host, key, value
+        
+    Returns:
+        Dict with the server's processing info and the processed/failed/total
+        counters summed over all requests, successful only if no value failed
+    """
+    totals = {"processed": 0, "failed": 0, "total": 0}
+    for start in range(0, len(data_points), ZABBIX_SENDER_BATCH):
+      try:
+        response = self._send_packet(data_points[start:start + ZABBIX_SENDER_BATCH])
+      except (OSError, ValueError) as e:
+        return {"success": False, "error": f"Failed to send to Zabbix server: {str(e)}", **totals}
+      
+      if response.get("response") != "success":
+        return {"success": False, "error": response.get("info", "Zabbix server rejected the data"), **totals}
+      
+      for name, count in _parse_sender_info(response.get("info", "")).items():
+        totals[name] += count
+    
+    message = "processed: {processed}; failed: {failed}; total: {total}".format(**totals)
+    if totals["failed"]:
+      # Rejected values (unknown host or item, wrong type) fail the send, as with zabbix_sender
+      return {"success": False, "error": message, "message": message, **totals}
+    
+    return {"success": True, "message": message, **totals}
+  
+  def send_values(self, items: List[Tuple[str, str, Any]]) -> Dict:
+    """
+    Send many (host, key, value) tuples, batched into as few requests as possible
+    
+    Returns:
+        Dict with success status and processed/failed/total counters when
+        sent over the trapper socket
+    """
+    return self.send_values_to_zabbix([
+      {"host": host, "key": key, "value": value} for host, key, value in items
+    ])
+  
+  def _sender_command(self, args: List[str]) -> Optional[List[str]]:
+    """Build a zabbix_sender command line, None if the binary cannot be found"""
     zabbix_sender_path = self._find_zabbix_sender()
     if not zabbix_sender_path:
-      return {"success": False, "error": "zabbix_sender not found in PATH or common locations"}
+      return None
     
-    # Build the command
     cmd = [
       zabbix_sender_path,
       "-z", self.server,
       "-p", str(self.port),
-      "-s", hostname,
-      "-k", key,
-      "-o", str(value)
+      *args
     ]
     
     # Add TLS options if configured
@@ -169,111 +702,92 @@ class ZabbixClient:
         "--tls-psk-file", psk_file_path
       ])
     
-    try:
-      # Print the command (for debugging)
-      print(f"Executing: {' '.join(cmd)}")
-      
-      # Execute the command
-      process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-      stdout, stderr = process.communicate()
-      
-      stdout_str = stdout.decode('utf-8')
-      stderr_str = stderr.decode('utf-8')
-      
-      # If we have a stderr message, that's an error
-      if stderr_str and stderr_str.strip():
-        return {
-          "success": False, 
-          "error": stderr_str,
-          "command": " ".join(cmd)
-        }
-      
-      # If we have stdout but no stderr, consider it a success
-      # even if the return code is non-zero
+    # Log the command (for debugging)
+    if logger.isEnabledFor(logging.DEBUG):
+      logger.debug("Executing: %s", shlex.join(cmd))
+    return cmd
+  
+  @staticmethod
+  def _sender_result(cmd: List[str], returncode: int, stdout: bytes, stderr: bytes) -> Dict:
+    """Turn zabbix_sender output into a result dict"""
+    stdout_str = stdout.decode('utf-8')
+    stderr_str = stderr.decode('utf-8')
+    # Same counters as the trapper socket path reports
+    counts = _sender_output_counts(stdout_str)
+    
+    # zabbix_sender exits with 0 only when every value was processed (2 means
+    # some failed); stderr may carry warnings and does not decide the outcome
+    if returncode != 0:
       return {
-        "success": True,
+        "success": False,
+        "error": stderr_str.strip() or stdout_str,
         "message": stdout_str,
         "command": " ".join(cmd),
-        "returncode": process.returncode
+        "returncode": returncode,
+        **counts
       }
+    
+    return {
+      "success": True,
+      "message": stdout_str,
+      "command": " ".join(cmd),
+      "returncode": returncode,
+      **counts
+    }
+  
+  def _run_sender(self, cmd: List[str], input_data: Optional[bytes] = None) -> Dict:
+    """Run zabbix_sender to completion and collect its result"""
+    try:
+      process = subprocess.run(cmd, input=input_data, capture_output=True, timeout=SENDER_PROCESS_TIMEOUT)
+      return self._sender_result(cmd, process.returncode, process.stdout, process.stderr)
     except Exception as e:
       return {"success": False, "error": str(e)}
   
-  def send_values_to_zabbix(self, data_points: List[Dict]) -> Dict:
+  @staticmethod
+  def _sender_input(data_points: Sequence[Mapping[str, Any]]) -> bytes:
+    """zabbix_sender input file contents, one "host key value" line per point"""
+    return "".join(
+      f"{point['host']} {point['key']} {point['value']}\n" for point in data_points
+    ).encode('utf-8')
+  
+  def send_value(self, hostname: str, key: str, value: Any) -> Dict:
+    """
+    Send a value to Zabbix, over a trapper socket or using zabbix_sender with PSK authentication
+    
+    Every call is a round-trip of its own; to send many values collect them
+    and call send_values_to_zabbix once.
+    """
+    if self.uses_socket():
+      return self._send_with_socket([{"host": hostname, "key": key, "value": value}])
+    
+    cmd = self._sender_command(["-s", hostname, "-k", key, "-o", str(value)])
+    if not cmd:
+      return {"success": False, "error": "zabbix_sender not found in PATH or common locations"}
+    
+    return self._run_sender(cmd)
+  
+  def send_values_to_zabbix(self, data_points: Sequence[Mapping[str, Any]]) -> Dict:
     """
     Send multiple values to Zabbix
     data_points: List of dictionaries with keys: host, key, value
+    
+    Values go out ZABBIX_SENDER_BATCH (250) per trapper request, so N points
+    cost ceil(N / 250) connections; zabbix_sender batches the same way when
+    it is used, from a single process per call.
     """
     if not data_points:
       return {"success": True, "message": "No data points to send"}
     
-    # For multiple points, use the batch file method
-    # Create a temporary file for the data
-    with tempfile.NamedTemporaryFile(mode='w+', delete=False) as temp_file:
-      for point in data_points:
-        temp_file.write(f"{point['host']} {point['key']} {point['value']}\n")
-      temp_file_path = temp_file.name
+    if self.uses_socket():
+      return self._send_with_socket(data_points)
     
-    # Find zabbix_sender
-    zabbix_sender_path = self._find_zabbix_sender()
-    if not zabbix_sender_path:
-      os.unlink(temp_file_path)  # Clean up
+    # For multiple points, feed the batch to zabbix_sender on stdin, "-i -"
+    cmd = self._sender_command(["-i", "-"])
+    if not cmd:
       return {"success": False, "error": "zabbix_sender not found in PATH or common locations"}
     
-    # Build the command
-    cmd = [
-      zabbix_sender_path,
-      "-z", self.server,
-      "-p", str(self.port),
-      "-i", temp_file_path
-    ]
-    
-    # Add TLS options if configured
-    if self.tls_connect == "psk":
-      psk_file_path = self._get_psk_file_path()
-      
-      cmd.extend([
-        "--tls-connect", "psk",
-        "--tls-psk-identity", self.tls_psk_identity,
-        "--tls-psk-file", psk_file_path
-      ])
-    
-    try:
-      # Print the command (for debugging)
-      print(f"Executing: {' '.join(cmd)}")
-      
-      # Execute the command
-      process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-      stdout, stderr = process.communicate()
-      
-      # Clean up the temporary file
-      os.unlink(temp_file_path)
-      
-      stdout_str = stdout.decode('utf-8')
-      stderr_str = stderr.decode('utf-8')
-      
-      # If we have a stderr message, that's an error
-      if stderr_str and stderr_str.strip():
-        return {
-          "success": False, 
-          "error": stderr_str,
-          "command": " ".join(cmd)
-        }
-      
-      # If we have stdout but no stderr, consider it a success
-      # even if the return code is non-zero (zabbix_sender can be picky)
-      return {
-        "success": True,
-        "message": stdout_str,
-        "command": " ".join(cmd),
-        "returncode": process.returncode
-      }
-    except Exception as e:
-      # Clean up the temporary file
-      if os.path.exists(temp_file_path):
-        os.unlink(temp_file_path)
-      return {"success": False, "error": str(e)}
-    
+    return self._run_sender(cmd, self._sender_input(data_points))
+  
   def get_item_history(self, hostname: str, key: str, limit: int = 2) -> List[Dict]:
     """
     Get the most recent values for a specific item from Zabbix
@@ -293,29 +807,30 @@ class ZabbixClient:
       return []
     
     # First, get the host ID
-    host_result = self.get_host(hostname)
-    if not host_result.get("result"):
+    hosts = self.get_host(hostname).get("result")
+    if not hosts:
       return []
     
-    host_id = host_result.get("result")[0].get("hostid")
+    host_id = hosts[0].get("hostid")
     
     # Then, get the item ID
     item_params = {
-      "output": ["itemid", "key_", "lastvalue", "prevvalue"],
+      "output": ["itemid", "key_", "value_type", "lastvalue", "prevvalue"],
       "hostids": host_id,
       "filter": {
         "key_": key
       }
     }
     
-    item_result = self.api_call("item.get", item_params)
-    if not item_result.get("result"):
+    items = self.api_call("item.get", item_params).get("result")
+    if not items:
       return []
     
-    item_id = item_result.get("result")[0].get("itemid")
+    item = items[0]
+    item_id = item.get("itemid")
     
     # Get the history type (0 = numeric float, 3 = numeric unsigned)
-    item_type = item_result.get("result")[0].get("value_type", 3)
+    item_type = item.get("value_type", 3)
     
     # Get the history
     history_params = {
@@ -331,7 +846,6 @@ class ZabbixClient:
     
     if not history_result.get("result"):
       # If no history, use the lastvalue and prevvalue from item.get
-      item = item_result.get("result")[0]
       return [
         {
           "value": item.get("lastvalue"),
@@ -343,4 +857,4 @@ class ZabbixClient:
         }
       ]
     
-    return history_result.get("result", [])
\ No newline at end of file
+    return history_result.get("result", [])
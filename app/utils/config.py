@@ -24,9 +24,9 @@ class ConfigLoader:
     try:
       with open(config_path, 'r') as f:
         self._config = json.load(f)
-      logger.info(f"Configuration loaded from {config_path}")
+      logger.info("Configuration loaded from %s", config_path)
     except Exception as e:
-      logger.error(f"Error loading configuration from {config_path}: {str(e)}")
+      logger.error("Error loading configuration from %s: %s", config_path, e)
       # Initialize with empty config
       self._config = {}
 
@@ -1,8 +1,13 @@
+import atexit
 import logging
 import os
-from flask import current_app, request, redirect
+import queue
+from flask import current_app, has_request_context, request, redirect
 from werkzeug.local import LocalProxy
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Background thread writing queued records to the real handlers
+_listener = None
 
 def get_log_dir():
   try:
@@ -10,15 +15,30 @@ def get_log_dir():
   except RuntimeError:
     return 'log'
 
+def _remote_addr():
+  # Outside a request (cron scripts, background threads) skip the request proxy lookup
+  return request.remote_addr if has_request_context() else 'N/A'
+
 class RequestFormatter(logging.Formatter):
   """
   Add remote address to log record in formatted log output.
   """
   def format(self, record):
-    record.remote_addr = request.remote_addr if request else 'N/A'
+    if not hasattr(record, 'remote_addr'):
+      record.remote_addr = _remote_addr()
     return super().format(record)
 
+class RequestQueueHandler(QueueHandler):
+  """
+  Queue records for the listener thread, capturing the remote address first
+  since the request context is not available on that thread.
+  """
+  def prepare(self, record):
+    record.remote_addr = _remote_addr()
+    return super().prepare(record)
+
 def setup_logging():
+  global _listener
   log_dir = get_log_dir()
 
   os.makedirs(log_dir, exist_ok=True)
@@ -30,7 +50,8 @@ def setup_logging():
   file_handler = RotatingFileHandler(
     os.path.join(log_dir, 'api.log'),
     maxBytes=10485760,  # 10MB
-    backupCount=5
+    backupCount=5,
+    delay=True  # the file is opened on the first write
   )
 
   file_handler.setFormatter(formatter)
@@ -45,12 +66,22 @@ def setup_logging():
   
   # Noņem esošos apstrādātājus, ja tādi ir
   root_logger.handlers.clear()
+  if _listener is not None:
+    _listener.stop()
   
-  # Pievieno apstrādātājus
-  root_logger.addHandler(file_handler)
-  root_logger.addHandler(console_handler)
+  # Callers only enqueue records, the listener thread formats and writes them
+  log_queue = queue.SimpleQueue()
+  root_logger.addHandler(RequestQueueHandler(log_queue))
+  _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+  _listener.start()
   
   # Apspiež werkzeug žurnālu veidošanu
   logging.getLogger('werkzeug').setLevel(logging.WARNING)
   
-  return root_logger
\ No newline at end of file
+  return root_logger
+
+@atexit.register
+def _stop_listener():
+  """Flush queued records before the interpreter exits"""
+  if _listener is not None:
+    _listener.stop()
\ No newline at end of file
@@ -13,7 +13,6 @@ Options:
 import os
 import sys
 import logging
-import requests
 import argparse
 from datetime import datetime
 
@@ -29,20 +28,35 @@ logging.basicConfig(
 
 logger = logging.getLogger('update_queue_metrics')
 
+# Keep-alive session reused for every call to the monitor API, created on first use
+_session = None
+
+def get_session():
+    """Return the shared API session, importing requests only when it is needed"""
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
+
 def parse_args():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description='Update RabbitMQ queue metrics in Zabbix')
     parser.add_argument('--no-warnings', action='store_true', help="Don't check for threshold warnings")
     parser.add_argument('--no-emails', action='store_true', help="Don't send email notifications")
     return parser.parse_args()
-    return parser.parse_args()
 
 def update_metrics(api_url, check_threshold=True):
     """Update RabbitMQ queue metrics in Zabbix"""
     try:
         # Send request to the API
         url = f"{api_url}/api/zabbix/update-queue-metrics"
-        response = requests.post(
+        response = get_session().post(
             url,
             json={"check_threshold": check_threshold},
             timeout=30
@@ -54,26 +68,27 @@ def update_metrics(api_url, check_threshold=True):
             updated_count = len(data.get('updated_items', []))
             warnings_count = len(data.get('warnings', []))
             
-            logger.info(f"Successfully updated {updated_count} queue metrics")
+            logger.info("Successfully updated %d queue metrics", updated_count)
             
             if warnings_count > 0:
-                logger.warning(f"Found {warnings_count} queue warnings")
+                logger.warning("Found %d queue warnings", warnings_count)
                 
                 # Log each warning
                 for warning in data.get('warnings', []):
                     logger.warning(
-                        f"Warning for {warning.get('host')}:{warning.get('key')} - "
-                        f"Value increased from {warning.get('previous_value')} to {warning.get('current_value')} "
-                        f"({warning.get('increase_percentage')}%)"
+                        "Warning for %s:%s - Value increased from %s to %s (%s%%)",
+                        warning.get('host'), warning.get('key'),
+                        warning.get('previous_value'), warning.get('current_value'),
+                        warning.get('increase_percentage')
                     )
             
             return True, data
         else:
-            logger.error(f"API request failed: {response.status_code} - {response.text}")
+            logger.error("API request failed: %s - %s", response.status_code, response.text)
             return False, response.text
             
     except Exception as e:
-        logger.error(f"Error updating metrics: {str(e)}")
+        logger.error("Error updating metrics: %s", e)
         return False, str(e)
 
 def main():
@@ -83,7 +98,7 @@ def main():
     # Get API URL from environment or use default
     api_url = os.environ.get('API_URL', 'http://localhost:5000')
     
-    logger.info(f"Starting queue metrics update at {datetime.now().isoformat()}")
+    logger.info("Starting queue metrics update at %s", datetime.now().isoformat())
     
     # Update metrics
     success, data = update_metrics(api_url, not args.no_warnings)
@@ -91,7 +106,7 @@ def main():
     if success:
         logger.info("Metrics update completed successfully")
     else:
-        logger.error(f"Metrics update failed: {data}")
+        logger.error("Metrics update failed: %s", data)
         sys.exit(1)
 
 if __name__ == '__main__':
@@ -0,0 +1,57 @@
+# test_email.py
+import os
+import tempfile
+from app.core.email import EmailSender, _parse_template
+
+QUEUE_INFO = {'vhost': '/', 'queue': 'orders', 'zabbix_host': 'rabbitmq-host', 'cluster_id': 'prod'}
+
+def render(template_text):
+    """Build drift alert content from a template file holding template_text"""
+    fd, path = tempfile.mkstemp(suffix='.html')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(template_text)
+        sender = EmailSender()
+        sender.templates = {'drift': path}
+        sender._drift_template_name = 'drift'
+        return sender._build_drift_alert_content(QUEUE_INFO, 150, 100, 50.0, timestamp='2024-01-01 00:00:00')
+    finally:
+        os.unlink(path)
+
+def test_parse_template():
+    """Only text without any braces skips formatting"""
+    assert _parse_template("<p>static</p>") == ("<p>static</p>", False)
+    assert _parse_template("<p>{queue}</p>")[1] is True
+    assert _parse_template("<style>p {color: red}</style>")[1] is True
+
+def test_template_without_fields():
+    """A template without braces is used as is"""
+    assert render("<p>Queue grew</p>") == "<p>Queue grew</p>"
+
+def test_template_fields_filled():
+    """Named fields are filled in"""
+    content = render("<p>{vhost}/{queue}: {previous_value} -> {current_value} ({increase_percentage:.1f}%) at {timestamp}</p>")
+    assert content == "<p>//orders: 100 -> 150 (50.0%) at 2024-01-01 00:00:00</p>"
+
+def test_template_invalid_braces_fall_back():
+    """CSS braces next to fields, or positional fields, fall back to the plain alert content"""
+    for text in ("<style>p {color: red}</style><p>{queue}</p>", "<p>{0}</p>"):
+        content = render(text)
+        assert '{' not in content
+        assert "Queue //orders has increased from 100 to 150 messages (50.0%)." in content
+
+def test_default_template():
+    """Without a template file the built-in template is rendered"""
+    sender = EmailSender()
+    sender._drift_template_name = None
+    content = sender._build_drift_alert_content(QUEUE_INFO, 150, 100, 50.0, timestamp='2024-01-01 00:00:00')
+    assert 'orders' in content
+    assert '2024-01-01 00:00:00' in content
+
+if __name__ == "__main__":
+    test_parse_template()
+    test_template_without_fields()
+    test_template_fields_filled()
+    test_template_invalid_braces_fall_back()
+    test_default_template()
+    print("All email tests passed")
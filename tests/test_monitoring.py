@@ -0,0 +1,134 @@
+# test_monitoring.py
+import threading
+from app.core.monitoring import MonitoringService, ZabbixStream, ZABBIX_BATCH_SIZE, ZABBIX_QUEUE_SIZE
+
+class FakeZabbixClient:
+    """Records sent batches; raises on every send when fail is set"""
+    def __init__(self, socket=True, fail=False, failed_per_batch=0):
+        self.socket = socket
+        self.fail = fail
+        self.failed_per_batch = failed_per_batch
+        self.batches = []
+
+    def uses_socket(self):
+        return self.socket
+
+    def send_values_to_zabbix(self, data_points):
+        self.batches.append(list(data_points))
+        if self.fail:
+            raise OSError("connection refused")
+        failed = min(self.failed_per_batch, len(data_points))
+        return {
+            "success": not failed,
+            "processed": len(data_points) - failed,
+            "failed": failed,
+            "total": len(data_points)
+        }
+
+def metric(index):
+    return {
+        'host': 'rabbitmq-host',
+        'queue_info': {'vhost': '/', 'queue': f'q{index}', 'messages': index, 'consumers': 1, 'state': 'running'},
+        'metrics': {'messages': index, 'consumers': 1}
+    }
+
+def run_stream(client, count, timeout=10):
+    """Feed count metrics through a stream in a worker thread, failing if it hangs"""
+    outcome = {}
+    def produce():
+        stream = ZabbixStream(client)
+        for i in range(count):
+            stream.put_metric(metric(i))
+        outcome['result'] = stream.close()
+        outcome['sent'] = stream.sent
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    worker.join(timeout)
+    assert not worker.is_alive(), "ZabbixStream did not finish"
+    return outcome['result'], outcome['sent']
+
+def test_stream_sends_all_points():
+    """Every point is sent and counted as processed"""
+    client = FakeZabbixClient()
+    result, sent = run_stream(client, 200)
+    assert sent == 400
+    assert sum(len(b) for b in client.batches) == 400
+    assert all(len(b) <= ZABBIX_BATCH_SIZE for b in client.batches)
+    assert result['success'] is True
+
+def test_stream_raising_sender_does_not_hang():
+    """A sender that raises ends the stream with a failed result instead of blocking the producer"""
+    client = FakeZabbixClient(fail=True)
+    result, sent = run_stream(client, ZABBIX_QUEUE_SIZE * 2)
+    assert sent == 0
+    assert result['success'] is False
+
+def test_stream_counts_processed_points():
+    """Points the server rejected are not counted as sent"""
+    client = FakeZabbixClient(failed_per_batch=10)
+    result, sent = run_stream(client, 50)
+    assert sent == 100 - 10 * len(client.batches)
+    assert result['success'] is False
+
+def test_stream_cli_sends_once():
+    """Without the trapper socket all points go to zabbix_sender in a single call"""
+    client = FakeZabbixClient(socket=False)
+    result, sent = run_stream(client, 300)
+    assert len(client.batches) == 1
+    assert len(client.batches[0]) == 600
+    assert sent == 600
+    assert result['success'] is True
+
+class FakeDriftClient:
+    """Answers resolve_items with fixed items and history.get with fixed value counts"""
+    def __init__(self, items, history_counts=None):
+        self.items = items
+        self.history_counts = history_counts or {}
+        self.history_calls = []
+
+    def resolve_items(self, pairs):
+        return {pair: self.items[pair[1]] for pair in pairs if pair[1] in self.items}
+
+    def has_previous_value(self, item):
+        self.history_calls.append(item['itemid'])
+        return self.history_counts.get(item['itemid'], 0) >= 2
+
+def drift_alerts(items, history_counts=None):
+    """Run check_queue_drift over one monitored queue per item, keyed by queue name"""
+    service = MonitoringService({'monitoring': {'threshold': 1000, 'queues': [
+        {'vhost': '/', 'queue': name, 'zabbix_host': 'rabbitmq-host'} for name in items
+    ]}})
+    client = FakeDriftClient(
+        {f"rabbitmq.test.queue.size[/,{name}]": item for name, item in items.items()},
+        history_counts
+    )
+    service.zabbix_client = client
+    return [alert['queue_info']['queue'] for alert in service.check_queue_drift()], client
+
+def test_drift_skips_single_value_item():
+    """An item with one sample (previous value reported as "0", clock "0") raises no alert"""
+    alerts, _ = drift_alerts({
+        'single': {'itemid': '1', 'lastvalue': '50', 'prevvalue': '0', 'lastclock': '1700000000', 'prevclock': '0'},
+        'grown': {'itemid': '2', 'lastvalue': '50', 'prevvalue': '10', 'lastclock': '1700000060', 'prevclock': '1700000000'},
+        'empty': {'itemid': '3', 'lastvalue': '0', 'prevvalue': '0', 'lastclock': '0', 'prevclock': '0'}
+    })
+    assert alerts == ['grown']
+
+def test_drift_without_prevclock_checks_history():
+    """Without prevclock, a previous value of 0 is only trusted when history holds two values"""
+    alerts, client = drift_alerts({
+        'single': {'itemid': '1', 'lastvalue': '50', 'prevvalue': '0', 'lastclock': '1700000000'},
+        'was_empty': {'itemid': '2', 'lastvalue': '50', 'prevvalue': '0', 'lastclock': '1700000060'},
+        'grown': {'itemid': '3', 'lastvalue': '50', 'prevvalue': '10', 'lastclock': '1700000060'}
+    }, history_counts={'1': 1, '2': 2})
+    assert alerts == ['was_empty', 'grown']
+    assert client.history_calls == ['1', '2']
+
+if __name__ == "__main__":
+    test_stream_sends_all_points()
+    test_stream_raising_sender_does_not_hang()
+    test_stream_counts_processed_points()
+    test_stream_cli_sends_once()
+    test_drift_skips_single_value_item()
+    test_drift_without_prevclock_checks_history()
+    print("All monitoring tests passed")
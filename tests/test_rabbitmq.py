@@ -1,7 +1,11 @@
 # test_rabbitmq.py
 import sys
 import os
+import json
 import logging
+import threading
+import time
+import requests
 from app.utils.config import config
 from app.core.rabbitmq import RabbitMQClient
 
@@ -49,5 +53,88 @@ def test_rabbitmq_client():
     except Exception as e:
         logger.error(f"Error in test: {str(e)}")
 
+class FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode()
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+class FakeSession:
+    """Answers GETs per node hostname; a node mapped to an exception raises it"""
+    def __init__(self, replies, delay=0):
+        self.replies = replies
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, url, auth=None, timeout=None):
+        hostname = url.split('//', 1)[1].split(':', 1)[0]
+        with self._lock:
+            self.calls.append(url)
+        time.sleep(self.delay)
+        reply = self.replies[hostname]
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+QUEUES = [{'vhost': '/', 'name': 'orders', 'messages': 5, 'consumers': 1, 'state': 'running'}]
+
+def make_client(session):
+    client = RabbitMQClient({'rabbitmq': {'clusters': [{
+        'id': 'test',
+        'nodes': [
+            {'hostname': 'node1', 'api_port': 15672, 'primary': True},
+            {'hostname': 'node2', 'api_port': 15672}
+        ],
+        'auth': {'user': 'guest', 'password': 'guest'}
+    }]}})
+    client.session = session
+    return client
+
+def test_failover_to_next_node():
+    """A node that cannot be reached is skipped and moved to the back of the order"""
+    session = FakeSession({
+        'node1': requests.exceptions.ConnectionError("connection refused"),
+        'node2': FakeResponse(200, QUEUES)
+    })
+    client = make_client(session)
+    assert client.get_all_queues('test') == QUEUES
+    assert [url.split('/')[2] for url in session.calls] == ['node1:15672', 'node2:15672']
+    assert [n['hostname'] for n in client._node_order['test']] == ['node2', 'node1']
+    assert 'test' not in client.last_errors
+
+def test_client_error_not_failed_over():
+    """A 4xx answer is returned as an error without trying the other nodes"""
+    session = FakeSession({'node1': FakeResponse(401, {'error': 'not_authorised'}), 'node2': FakeResponse(200, QUEUES)})
+    client = make_client(session)
+    assert client.get_all_queues('test') == []
+    assert len(session.calls) == 1
+    assert 'test' in client.last_errors
+
+def test_concurrent_requests_share_one_get():
+    """Concurrent listings of one cluster share a single request and the cached listing"""
+    session = FakeSession({'node1': FakeResponse(200, QUEUES), 'node2': FakeResponse(200, QUEUES)}, delay=0.2)
+    client = make_client(session)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_all_queues('test'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [QUEUES] * 8
+    assert len(session.calls) == 1
+    assert client.get_queue_info('test', '/', 'orders') == QUEUES[0]
+    assert len(session.calls) == 1
+
 if __name__ == "__main__":
-    test_rabbitmq_client()
\ No newline at end of file
+    test_rabbitmq_client()
+    test_failover_to_next_node()
+    test_client_error_not_failed_over()
+    test_concurrent_requests_share_one_get()
\ No newline at end of file
@@ -0,0 +1,173 @@
+# test_zabbix.py
+import gc
+import json
+import os
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import threading
+from app.core import zabbix
+from app.core.zabbix import ZabbixClient, ZABBIX_SENDER_BATCH
+
+HEADER = struct.Struct('<5sII')
+
+class FakeTrapper:
+    """Zabbix trapper on localhost answering every request with a fixed info string"""
+    def __init__(self, info=None, response="success"):
+        self.info = info
+        self.response = response
+        self.requests = []
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen()
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _recv(self, conn, length):
+        data = b''
+        while len(data) < length:
+            chunk = conn.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("client closed the connection")
+            data += chunk
+        return data
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            with conn:
+                _, length, _ = HEADER.unpack(self._recv(conn, HEADER.size))
+                request = json.loads(self._recv(conn, length))
+                self.requests.append(request)
+                count = len(request['data'])
+                info = self.info or f"processed: {count}; failed: 0; total: {count}; seconds spent: 0.000100"
+                body = json.dumps({"response": self.response, "info": info}).encode()
+                conn.sendall(HEADER.pack(b'ZBXD\x01', len(body), 0) + body)
+
+    def close(self):
+        # shutdown wakes the thread blocked in accept, close alone does not
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._thread.join()
+
+def make_client(port):
+    return ZabbixClient({'zabbix': {'server': '127.0.0.1', 'port': port, 'sender': 'socket'}})
+
+def points(count):
+    return [{'host': 'rabbitmq-host', 'key': f'rabbitmq.q{i}.messages', 'value': i} for i in range(count)]
+
+def test_socket_send_success():
+    """All values processed: success, with the server counters"""
+    server = FakeTrapper()
+    try:
+        result = make_client(server.port).send_values_to_zabbix(points(3))
+        assert result['success'] is True
+        assert (result['processed'], result['failed'], result['total']) == (3, 0, 3)
+        assert [d['value'] for d in server.requests[0]['data']] == ['0', '1', '2']
+    finally:
+        server.close()
+
+def test_socket_send_batches():
+    """Values go out ZABBIX_SENDER_BATCH per request and the counters are summed"""
+    server = FakeTrapper()
+    try:
+        result = make_client(server.port).send_values_to_zabbix(points(ZABBIX_SENDER_BATCH + 50))
+        assert result['success'] is True
+        assert result['processed'] == ZABBIX_SENDER_BATCH + 50
+        assert [len(r['data']) for r in server.requests] == [ZABBIX_SENDER_BATCH, 50]
+    finally:
+        server.close()
+
+def test_socket_send_failed_values():
+    """A response of "success" with failed values is reported as unsuccessful"""
+    server = FakeTrapper(info="processed: 0; failed: 300; total: 300; seconds spent: 0.000500")
+    try:
+        result = make_client(server.port).send_values_to_zabbix(points(1))
+        assert result['success'] is False
+        assert result['failed'] == 300
+        assert 'failed: 300' in result['error']
+    finally:
+        server.close()
+
+def test_socket_send_rejected():
+    """A non-success response fails the send with the server's info"""
+    server = FakeTrapper(info="invalid request", response="failed")
+    try:
+        result = make_client(server.port).send_values_to_zabbix(points(1))
+        assert result['success'] is False
+        assert result['error'] == "invalid request"
+    finally:
+        server.close()
+
+def test_socket_send_unreachable():
+    """A closed port is reported as an error instead of raising"""
+    # A port that was bound but never listened on refuses connections
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    result = make_client(port).send_values_to_zabbix(points(1))
+    assert result['success'] is False
+    assert 'Failed to send to Zabbix server' in result['error']
+
+PSK_CONFIG = {'zabbix': {'server': '127.0.0.1', 'tls_connect': 'psk', 'tls_psk_identity': 'monitor', 'psk_key': '0123456789abcdef'}}
+
+def write_psk_tempfile(client):
+    """Write the PSK through the temp file fallback used where memfd is not available"""
+    memfd_create = getattr(zabbix.os, 'memfd_create', None)
+    if memfd_create is not None:
+        del zabbix.os.memfd_create
+    try:
+        return client._write_psk_key()
+    finally:
+        if memfd_create is not None:
+            zabbix.os.memfd_create = memfd_create
+
+def test_psk_tempfile_removed_on_close():
+    """The PSK temp file is owner-only and removed by close()"""
+    client = ZabbixClient(PSK_CONFIG)
+    path = write_psk_tempfile(client)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    with open(path) as f:
+        assert f.read() == '0123456789abcdef'
+    client.close()
+    assert not os.path.exists(path)
+
+def test_psk_tempfile_removed_without_close():
+    """The PSK temp file does not outlive a client that is never closed"""
+    client = ZabbixClient(PSK_CONFIG)
+    path = write_psk_tempfile(client)
+    del client
+    gc.collect()
+    assert not os.path.exists(path)
+    
+    # Nor a process that exits with the client still alive
+    script = (
+        "import tests.test_zabbix as t\n"
+        "from app.core.zabbix import ZabbixClient\n"
+        "client = ZabbixClient(t.PSK_CONFIG)\n"
+        "print(t.write_psk_tempfile(client))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, check=True).stdout
+    path = output.strip().splitlines()[-1]
+    assert path and not os.path.exists(path)
+
+if __name__ == "__main__":
+    test_socket_send_success()
+    test_socket_send_batches()
+    test_socket_send_failed_values()
+    test_socket_send_rejected()
+    test_socket_send_unreachable()
+    test_psk_tempfile_removed_on_close()
+    test_psk_tempfile_removed_without_close()
+    print("All Zabbix tests passed")